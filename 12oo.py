@@ -1,202 +1,227 @@
-import pandas as pd
+import argparse
 import glob
-from pathlib import Path
-from datetime import datetime, timezone, timedelta
+import os
 
-# === Moscow Timezone Setup ===
-MOSCOW_TZ = timezone(timedelta(hours=3))
+import run_metrics
+import stage_profile
+from lazy_imports import lazy_import
+from stage_profile import stage
 
-# === Collect matching Excel files ===
-files = glob.glob("Transaction-List-Date_*.xlsx")
-
-if not files:
-    print("❌ No files found matching Transaction-List-Date_*.xlsx")
-    exit(1)
-
-print(f"📁 Files found: {len(files)}")
-for f in files:
-    print(f" - {f}")
+pd = lazy_import('pandas')
+# Loaded with the first export, so a run without files does not pay for them
+transaction_cache = lazy_import('transaction_cache')
+transaction_reports = lazy_import('transaction_reports')
+typed_export = lazy_import('typed_export')
 
 DEBUG = False  # Set to True for detailed logging
 
-total_count = 0
-merchant_counts = {}
-selected_time_column = None  # Will be filled after user choice
-
-
-def get_merchant_column_index(df):
-    """Searches for the merchant name column index in the header (first row)."""
-    try:
-        first_row = df.iloc[0]
-        for idx, cell in enumerate(first_row):
-            cell_str = str(cell).strip().lower()
-            if 'merchant' in cell_str or 'name' in cell_str:
-                return idx
-    except Exception:
-        pass
-    return -1
+NOON_WINDOW = (0, 12)  # по умолчанию — до 12:00
 
 
 def get_all_time_columns(df):
     """Searches for ALL columns with time data."""
     time_columns = []
     try:
-        first_row = df.iloc[0]
-        for idx, cell in enumerate(first_row):
-            cell_str = str(cell).strip().lower()
-            if any(keyword in cell_str for keyword in ['created', 'date', 'time', 'timestamp', 'updated', 'completion']):
-                time_columns.append((idx, str(df.iloc[0, idx]).strip()))
+        # Те же колонки, что typed_export переводит во время при чтении
+        for idx in typed_export.time_column_indexes(df.iloc[0]):
+            time_columns.append((idx, str(df.iloc[0, idx]).strip()))
     except Exception:
         pass
     return time_columns
 
 
-def extract_merchant_from_row(df, row_idx, merchant_col_idx):
-    """Extracts merchant name from a row by column index."""
+def choose_time_column(first_file, label=None):
+    """Asks which time column to count by, based on the header of the first file."""
+    label = window_label(NOON_WINDOW) if label is None else label
     try:
-        if merchant_col_idx >= 0 and merchant_col_idx < df.shape[1]:
-            merchant = str(df.iat[row_idx, merchant_col_idx]).strip()
-            if merchant and merchant.lower() not in ['nan', '']:
-                return merchant
-    except Exception:
-        pass
-    return None
-
-
-# === Determine column for counting before processing ===
-print("\n" + "="*60)
-first_file = files[0]
-try:
-    sample_df = pd.read_excel(first_file, header=None)
-    first_cell = str(sample_df.iloc[0, 0]).strip()
-    if first_cell.lower() == "transactions":
-        sample_df = sample_df.iloc[1:].reset_index(drop=True)
-    
-    time_cols = get_all_time_columns(sample_df)
-    
-    if time_cols:
-        print("🕐 Time columns found:")
-        for i, (col_idx, col_name) in enumerate(time_cols, 1):
-            print(f"   {i}. [{col_idx}] {col_name}")
-        
-        print("\nChoose which column to use for counting transactions before 12:00:")
-        choice = input("Enter number (1-{}): ".format(len(time_cols)))
-        
-        try:
-            choice_idx = int(choice) - 1
-            if 0 <= choice_idx < len(time_cols):
-                selected_time_column = time_cols[choice_idx][0]
-                selected_time_name = time_cols[choice_idx][1]
-                print(f"✅ Selected column: [{selected_time_column}] {selected_time_name}\n")
-            else:
+        # Only the "Transactions" title row and the header row are needed here
+        header_rows = transaction_cache.read_header_cached(first_file, rows=2)
+        sample_df = typed_export.strip_title_row(pd.DataFrame(header_rows))
+        time_cols = get_all_time_columns(sample_df)
+
+        if time_cols:
+            print("🕐 Time columns found:")
+            for i, (col_idx, col_name) in enumerate(time_cols, 1):
+                print(f"   {i}. [{col_idx}] {col_name}")
+
+            print(f"\nChoose which column to use for counting transactions {label}:")
+            choice = input("Enter number (1-{}): ".format(len(time_cols)))
+
+            try:
+                choice_idx = int(choice) - 1
+                if 0 <= choice_idx < len(time_cols):
+                    selected_time_column = time_cols[choice_idx][0]
+                    selected_time_name = time_cols[choice_idx][1]
+                    print(f"✅ Selected column: [{selected_time_column}] {selected_time_name}\n")
+                    return selected_time_column
                 print(f"❌ Invalid choice. Using default column 2")
-                selected_time_column = 2
-        except ValueError:
-            print(f"❌ Invalid input. Using default column 2")
-            selected_time_column = 2
-    else:
-        print("⚠️ Time columns not found automatically. Using column 2")
-        selected_time_column = 2
-except Exception as e:
-    print(f"⚠️ Error determining columns: {e}. Using column 2")
-    selected_time_column = 2
+            except ValueError:
+                print(f"❌ Invalid input. Using default column 2")
+        else:
+            print("⚠️ Time columns not found automatically. Using column 2")
+    except Exception as e:
+        print(f"⚠️ Error determining columns: {e}. Using column 2")
+    return 2
 
-print("="*60 + "\n")
 
-for file in files:
-    try:
-        df = pd.read_excel(file, header=None)
+def window_label(window):
+    """"before 12:00" or "09:00-15:00" for a window of hours"""
+    start, end = window
+    if start == 0:
+        return f"before {end:02d}:00"
+    return f"{start:02d}:00-{end % transaction_reports.HOURS:02d}:00"
 
-        if df.empty:
-            continue
 
-        # Skip "Transactions" row if present
-        first_cell = str(df.iloc[0, 0]).strip()
-        if first_cell.lower() == "transactions":
-            df = df.iloc[1:].reset_index(drop=True)
+def print_before_noon_report(files, partials, selected_time_column, window=NOON_WINDOW):
+    """Prints per-file counts and the merchant totals for a window of hours from per-file partials."""
+    label = window_label(window)
+    total_count = 0
+    merchant_counts = {}
 
-        # Check for data
-        if len(df) < 2:
-            print(f"⚠️ Skipped {file}: insufficient data")
+    for file, part in zip(files, partials):
+        if 'error' in part:
+            print(f"❌ Error processing {file}: {part['error']}")
+            continue
+        if 'empty' in part:
+            continue
+        if 'skipped' in part:
+            print(f"⚠️ Skipped {file}: {part['skipped']}")
             continue
-
-        # Find column indices
-        merchant_col_idx = get_merchant_column_index(df)
-        created_col_idx = selected_time_column
 
         if DEBUG:
-            print(f"\n🔍 DEBUG: {Path(file).name}")
-            print(f"   Total columns: {df.shape[1]}")
-            print(f"   Rows: {len(df)}")
-            print(f"   Merchant index: {merchant_col_idx}")
-            print(f"   Time index: {created_col_idx}")
-        
-        # Count transactions before 12:00 Moscow time
-        merchants_in_file = {}
-        count_before_12 = 0
-        count_total = 0
-        count_invalid_time = 0
-        
-        for row_idx in range(1, len(df)):
-            count_total += 1
-            
-            try:
-                ts_str = str(df.iat[row_idx, created_col_idx]).strip()
-            except Exception:
-                ts_str = ''
-            
-            if not ts_str or ts_str.lower() == "nan":
-                count_invalid_time += 1
-                continue
-            
-            try:
-                # Try different time formats
-                dt_utc = None
-                try:
-                    dt_utc = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                except:
-                    try:
-                        dt_utc = pd.to_datetime(ts_str)
-                    except:
-                        count_invalid_time += 1
-                        continue
-                
-                if dt_utc.tzinfo is None:
-                    dt_utc = dt_utc.replace(tzinfo=timezone.utc)
-                
-                dt_moscow = dt_utc.astimezone(MOSCOW_TZ)
-                
-                if dt_moscow.hour < 12:
-                    count_before_12 += 1
-                    merchant_name = extract_merchant_from_row(df, row_idx, merchant_col_idx)
-                    if merchant_name:
-                        merchants_in_file[merchant_name] = merchants_in_file.get(merchant_name, 0) + 1
-            except Exception as e:
-                count_invalid_time += 1
-                continue
+            print(f"\n🔍 DEBUG: {os.path.basename(file)}")
+            print(f"   Total columns: {part['columns']}")
+            print(f"   Rows: {part['rows']}")
+            print(f"   Merchant index: {part['merchant_col']}")
+            print(f"   Time index: {selected_time_column}")
+
+        # Окно считается по часовой гистограмме файла, строки заново не разбираются
+        in_window, merchants_in_file = transaction_reports.window_counts(part, window)
 
         # Accumulate results
         for merchant, count in merchants_in_file.items():
             merchant_counts[merchant] = merchant_counts.get(merchant, 0) + count
             total_count += count
-        
+
         # Output result for file
         if merchants_in_file:
             merchants_list = ", ".join([f"{m}: {c}" for m, c in merchants_in_file.items()])
-            print(f"✅ {Path(file).name}")
-            print(f"   Total rows: {count_total} | Before 12:00: {count_before_12} | Time errors: {count_invalid_time}")
+            print(f"✅ {os.path.basename(file)}")
+            print(f"   Total rows: {part['total']} | {label[0].upper() + label[1:]}: {in_window} | Time errors: {part['invalid']}")
             print(f"   Merchants: {merchants_list}")
         else:
-            print(f"⚠️ {Path(file).name}")
-            print(f"   Total rows: {count_total} | Before 12:00: {count_before_12} | Time errors: {count_invalid_time}")
-
-    except Exception as e:
-        print(f"❌ Error processing {file}: {e}")
-
-# === Result ===
-print("\n" + "="*50)
-print(f"📊 Total transactions before 12:00 Moscow time: {total_count}")
-print("\nList of merchants and their transactions before 12:00:")
-for m, c in sorted(merchant_counts.items(), key=lambda x: x[1], reverse=True):
-    print(f" - {m}: {c}")
-print("="*50)
+            print(f"⚠️ {os.path.basename(file)}")
+            print(f"   Total rows: {part['total']} | {label[0].upper() + label[1:]}: {in_window} | Time errors: {part['invalid']}")
+
+    # === Result ===
+    print("\n" + "="*50)
+    print(f"📊 Total transactions {label} Moscow time: {total_count}")
+    print(f"\nList of merchants and their transactions {label}:")
+    for m, c in sorted(merchant_counts.items(), key=lambda x: x[1], reverse=True):
+        print(f" - {m}: {c}")
+    print("="*50)
+
+
+def print_hourly_distribution(partials, top=3):
+    """Prints transactions per hour of day for all files, with the top merchants of every hour."""
+    hour_totals = [0] * transaction_reports.HOURS
+    merchant_hours = {}
+    for part in partials:
+        if 'hour_totals' not in part:
+            continue
+        for hour, count in enumerate(part['hour_totals']):
+            hour_totals[hour] += count
+        for merchant, counts in zip(part['merchants'], part['merchant_hours']):
+            merged = merchant_hours.setdefault(merchant, [0] * transaction_reports.HOURS)
+            for hour, count in enumerate(counts):
+                merged[hour] += count
+
+    busiest = max(hour_totals) or 1
+    print("\n" + "="*50)
+    print("🕐 Transactions per hour, Moscow time:")
+    for hour, count in enumerate(hour_totals):
+        bar = "█" * round(count / busiest * 20)
+        leaders = sorted(((c[hour], m) for m, c in merchant_hours.items() if c[hour]), key=lambda x: x[0], reverse=True)
+        leaders_list = ", ".join(f"{m}: {c}" for c, m in leaders[:top])
+        print(f" {hour:02d}:00-{(hour + 1) % transaction_reports.HOURS:02d}:00 {count:>8} {bar:<20} {leaders_list}")
+    print("="*50)
+
+
+def hour_of_day(value):
+    hour = int(value)
+    if not 0 <= hour <= transaction_reports.HOURS:
+        raise argparse.ArgumentTypeError(f"hour must be 0-{transaction_reports.HOURS}")
+    return hour
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Transactions before 12:00 (or in any window of hours) Moscow time per merchant')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of files to parse in parallel (default 1)')
+    parser.add_argument('--before', type=hour_of_day, metavar='HH',
+                        help='Count transactions before HH:00 (default 12)')
+    parser.add_argument('--from', dest='start', type=hour_of_day, metavar='HH',
+                        help='Count transactions from HH:00 (with --to; the window may cross midnight)')
+    parser.add_argument('--to', dest='end', type=hour_of_day, metavar='HH',
+                        help='... up to HH:00, not including it')
+    parser.add_argument('--hours', action='store_true',
+                        help='Also print the full distribution of transactions per hour')
+    stage_profile.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.before is not None and (args.start is not None or args.end is not None):
+        parser.error('--before cannot be combined with --from/--to')
+    if (args.start is None) != (args.end is None):
+        parser.error('--from and --to go together')
+    if args.start is not None and args.start == args.end:
+        parser.error('--from and --to must differ')
+    if args.before == 0:
+        parser.error('--before 0 leaves no hours to count')
+    if args.start is not None:
+        # 0 и 24 — одна и та же полночь: --from 0 --to 24 — это весь день
+        hours = transaction_reports.HOURS
+        whole_day = args.start % hours == args.end % hours
+        args.window = (0, hours) if whole_day else (args.start % hours, args.end)
+    else:
+        args.window = (0, NOON_WINDOW[1] if args.before is None else args.before)
+    return args
+
+
+def main():
+    args = parse_arguments()
+    stage_profile.start_from_args(args)
+    run_metrics.start_from_args(args, '12oo')
+
+    # === Collect matching Excel files ===
+    files = glob.glob("Transaction-List-Date_*.xlsx")
+
+    if not files:
+        print("❌ No files found matching Transaction-List-Date_*.xlsx")
+        exit(1)
+
+    print(f"📁 Files found: {len(files)}")
+    for f in files:
+        print(f" - {f}")
+
+    # === Determine column for counting before processing ===
+    print("\n" + "="*60)
+    selected_time_column = choose_time_column(files[0], window_label(args.window))
+    print("="*60 + "\n")
+
+    with stage('files'):
+        # Партиал файла — гистограмма мерчант × час, окно на неё не влияет
+        partials = transaction_reports.map_files_incremental(
+            transaction_reports.hourly_partial, files, args.workers, time_col=selected_time_column
+        )
+    for file, part in zip(files, partials):
+        # Строки с неразбираемым временем — отброшенные
+        run_metrics.file_rows(file, part.get('total'), part.get('invalid'), error=part.get('error'))
+    with stage('report'):
+        print_before_noon_report(files, partials, selected_time_column, args.window)
+        if args.hours:
+            print_hourly_distribution(partials)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,87 @@
-import pandas as pd
+import argparse
 import glob
 import os
 import warnings
 
+import run_metrics
+import stage_profile
+from lazy_imports import lazy_import
+from stage_profile import stage
+
+# Loaded with the first export, so a run without files does not pay for it
+transaction_reports = lazy_import('transaction_reports')
+
 # Suppress openpyxl style warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
-# Find all files matching the pattern
-files = glob.glob("Transaction-*.xlsx")
-
-if not files:
-    print("❌ No files matching 'Transaction-*.xlsx' found in the current directory.")
-    exit()
-
-# Initialize total report for all files
-total_report = {
-    'CAPTURED': {'count': 0, 'amount': 0.0},
-    'CANCELLED': {'count': 0, 'amount': 0.0},
-    'DECLINED': {'count': 0, 'amount': 0.0},
-    'REFUNDED': {'count': 0, 'amount': 0.0},
-    'ERROR': {'count': 0, 'amount': 0.0},
-    'PAID_OUT': {'count': 0, 'amount': 0.0},
-}
-
-# Process each file
-for file_path in sorted(files):
-    print(f"\n📄 Processing file: {os.path.basename(file_path)}")
-    print("-" * 60)
-
-    try:
-        # Read Excel without headers
-        df = pd.read_excel(file_path, header=None, engine='openpyxl')
-
-        # Expect at least 8 columns (status index 6, amount index 7)
-        if df.shape[1] < 8:
-            print("⚠️  File has fewer than 8 columns — skipping.")
-            continue
-
-        statuses = df.iloc[:, 6]  # Status
-        amounts = df.iloc[:, 7]   # Amount
-
-        # Counting
-        for status, amount in zip(statuses, amounts):
-            if pd.isna(status) or pd.isna(amount):
-                continue
-            status = str(status).strip().upper()
-            if status in total_report:
-                total_report[status]['count'] += 1
-                try:
-                    total_report[status]['amount'] += float(amount)
-                except (ValueError, TypeError):
-                    continue  # skip invalid amounts
-
-    except Exception as e:
-        print(f"❌ Error processing {file_path}: {e}")
 
 # Format amount: 1,234,567.89
-def fmt_rub(value):
-    return f"{value:,.2f}"
-
-# Output final report
-print("\n" + "="*60)
-print("📊 FINAL REPORT FOR ALL FILES")
-print("="*60)
-print(f"- Successful transactions (CAPTURED): {total_report['CAPTURED']['count']} pcs for {fmt_rub(total_report['CAPTURED']['amount'])} RUB")
-print(f"- Unpaid transactions (CANCELLED): {total_report['CANCELLED']['count']} pcs for {fmt_rub(total_report['CANCELLED']['amount'])} RUB")
-print(f"- Declined transactions (DECLINED): {total_report['DECLINED']['count']} pcs for {fmt_rub(total_report['DECLINED']['amount'])} RUB")
-print(f"- Error transactions (ERROR): {total_report['ERROR']['count']} pcs for {fmt_rub(total_report['ERROR']['amount'])} RUB")
-print(f"- Refunds (REFUNDED): {total_report['REFUNDED']['count']} pcs for {fmt_rub(total_report['REFUNDED']['amount'])} RUB")
-print(f"- Payouts (PAID_OUT): {total_report['PAID_OUT']['count']} pcs for {fmt_rub(total_report['PAID_OUT']['amount'])} RUB")
-
-print("\n✅ Processing complete.")
+def fmt_rub(amount):
+    return transaction_reports.format_amount(amount)
+
+
+def print_report(report):
+    print(f"- Successful transactions (CAPTURED): {report['CAPTURED']['count']} pcs for {fmt_rub(report['CAPTURED']['amount'])} RUB")
+    print(f"- Unpaid transactions (CANCELLED): {report['CANCELLED']['count']} pcs for {fmt_rub(report['CANCELLED']['amount'])} RUB")
+    print(f"- Declined transactions (DECLINED): {report['DECLINED']['count']} pcs for {fmt_rub(report['DECLINED']['amount'])} RUB")
+    print(f"- Error transactions (ERROR): {report['ERROR']['count']} pcs for {fmt_rub(report['ERROR']['amount'])} RUB")
+    print(f"- Refunds (REFUNDED): {report['REFUNDED']['count']} pcs for {fmt_rub(report['REFUNDED']['amount'])} RUB")
+    print(f"- Payouts (PAID_OUT): {report['PAID_OUT']['count']} pcs for {fmt_rub(report['PAID_OUT']['amount'])} RUB")
+
+
+def print_status_report(files, partials):
+    """Prints the per-file tables and the final report from per-file partials."""
+    for file_path, part in zip(files, partials):
+        print(f"\n📄 Processing file: {os.path.basename(file_path)}")
+        print("-" * 60)
+        if 'skipped' in part:
+            print("⚠️  File has fewer than 8 columns — skipping.")
+        elif 'error' in part:
+            print(f"❌ Error processing {file_path}: {part['error']}")
+        else:
+            print_report(part['report'])
+
+    # Total report for all files
+    total_report = transaction_reports.merge_status(partials)
+
+    # Output final report
+    print("\n" + "="*60)
+    print("📊 FINAL REPORT FOR ALL FILES")
+    print("="*60)
+    print_report(total_report)
+
+    print("\n✅ Processing complete.")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Count and amount per status for Transaction-*.xlsx')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of files to parse in parallel (default 1)')
+    stage_profile.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    stage_profile.start_from_args(args)
+    run_metrics.start_from_args(args, 'angelina_report')
+
+    # Find all files matching the pattern
+    files = sorted(glob.glob("Transaction-*.xlsx"))
+
+    if not files:
+        print("❌ No files matching 'Transaction-*.xlsx' found in the current directory.")
+        exit()
+
+    # Process each file
+    with stage('files'):
+        partials = transaction_reports.map_files_incremental(transaction_reports.status_partial, files, args.workers)
+    for file, part in zip(files, partials):
+        run_metrics.file_rows(file, part.get('rows'), error=part.get('error'))
+    with stage('report'):
+        print_status_report(files, partials)
+
+
+if __name__ == "__main__":
+    main()
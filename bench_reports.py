@@ -0,0 +1,323 @@
+"""
+Бенчмарк скриптов отчётов на синтетических выгрузках
+
+Каждый скрипт (calc_stats, angelina_report, 12oo, calc_new, mosteh, rep0000)
+запускается отдельным процессом на данных из make_test_data.py, как его
+запускает пользователь. Записывается время, пиковая память процесса (RSS) и
+строк в секунду. Затем скрипт ещё раз запускается через свой main с профилем
+stage_profile (без tracemalloc), чтобы было видно, где тратится время: импорт
+вместе с pandas и openpyxl и этапы, которые отмечает сам скрипт. По этапам
+записывается только время — пиковый RSS процесса только растёт и на этапы не
+делится.
+
+Кэши выгрузок перед каждым прогоном отключаются или удаляются, так что
+меряется холодный запуск. Из нескольких повторов берётся лучшее время и
+наибольшая память.
+
+Результаты сохраняются в JSON. С --save-baseline они становятся базой, с
+которой сравниваются следующие прогоны: рост времени или памяти больше
+допуска отмечается как регрессия, и скрипт завершается с кодом 1.
+
+=== КАК ЗАПУСТИТЬ ===
+
+1. Наборы создаются автоматически, если их ещё нет:
+   python bench_reports.py --sizes 10k 100k
+
+2. Запомнить текущие цифры как базу, потом сравнивать с ней:
+   python bench_reports.py --sizes 100k --save-baseline
+   python bench_reports.py --sizes 100k
+
+3. Только часть скриптов, допуск 10%:
+   python bench_reports.py --scripts mosteh rep0000 --tolerance 0.1
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import make_test_data
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASELINE_FILE = 'bench_baseline.json'
+RESULTS_FILE = 'bench_results.json'
+
+# Этапы короче этого не сравниваются с базой — там один шум
+MIN_COMPARABLE_SECONDS = 0.05
+
+# Ответы rep0000 на вопросы про специальные аккаунты и финальный Enter;
+# у 12oo "1" — колонка "Created" синтетической выгрузки
+REP0000_STDIN = '100 150\n' * 5 + '\n'
+
+MOSTEH_OUTPUT = 'bench_report.xlsx'
+
+# Как запускать каждый скрипт: набор данных, аргументы и что подать на stdin
+SCRIPTS = {
+    'calc_stats': {'dataset': 'transactions', 'argv': ['calc_stats.py']},
+    'angelina_report': {'dataset': 'transactions', 'argv': ['angelina_report.py']},
+    '12oo': {'dataset': 'transactions', 'argv': ['12oo.py'], 'stdin': '1\n'},
+    'calc_new': {'dataset': 'orec', 'argv': ['calc_new.py']},
+    'mosteh': {'dataset': 'mosteh', 'argv': [
+        'mosteh.py', '--input', make_test_data.MOSTEH_FILE, '--output', MOSTEH_OUTPUT,
+        '--start_date', make_test_data.MOSTEH_START_DATE, '--end_date', make_test_data.MOSTEH_END_DATE,
+    ]},
+    'rep0000': {'dataset': 'rep0000', 'argv': ['rep0000.py'], 'stdin': REP0000_STDIN},
+}
+
+# Что скрипты оставляют в папке с данными между запусками
+LEFTOVERS = ['.transaction_cache', '.mosteh_encodings.json', '.rep0000_dialects.json',
+             '.rep0000_schemas.json', 'rep0000_logs', MOSTEH_OUTPUT]
+
+
+def clean_folder(folder):
+    for name in LEFTOVERS:
+        path = os.path.join(folder, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def bench_env():
+    env = dict(os.environ, TRANSACTION_CACHE='0', PYTHONIOENCODING='utf-8')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_DIR, env.get('PYTHONPATH')]))
+    return env
+
+
+def run_process(argv, folder, stdin=''):
+    """Запускает процесс в folder; возвращает (секунды, пиковый RSS в МиБ, код возврата, вывод)"""
+    with tempfile.TemporaryFile() as out:
+        start = time.perf_counter()
+        proc = subprocess.Popen(argv, cwd=folder, env=bench_env(),
+                                stdin=subprocess.PIPE, stdout=out, stderr=subprocess.STDOUT)
+        proc.stdin.write(stdin.encode())
+        proc.stdin.close()
+        rss = None
+        if hasattr(os, 'wait4'):
+            # wait4 отдаёт ресурсы именно этого процесса, а не всех детей сразу
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            rss = usage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+        else:
+            proc.wait()
+        seconds = time.perf_counter() - start
+        out.seek(0)
+        return seconds, rss, proc.returncode, out.read().decode('utf-8', errors='replace')
+
+
+# === Этапы внутри процесса ===
+
+def load_libraries():
+    """Загружает pandas, numpy, openpyxl и общие модули отчётов, которые lazy_import
+    отложил до первого обращения"""
+    for name in ('numpy', 'pandas', 'openpyxl'):
+        importlib.import_module(name).__version__
+    # Общие модули — только те, что скрипт запросил
+    for name in ('transaction_cache', 'typed_export', 'transaction_reports'):
+        if name in sys.modules:
+            sys.modules[name].__file__
+
+
+def run_stages(script):
+    """Запускает script в текущей папке через его же main с профилем по этапам; вывод глушится
+
+    Этапы — это отметки stage() самих скриптов (вложенные — через '/'), плюс
+    import и main вокруг них. Профиль без tracemalloc, поэтому память по
+    этапам не меряется: пиковый RSS есть только у запуска целиком.
+    """
+    sys.path.insert(0, REPO_DIR)
+    import stage_profile
+    stage_profile.start(memory=False)
+    spec = SCRIPTS[script]
+    sys.argv = list(spec['argv'])
+    sys.stdin = io.StringIO(spec.get('stdin', ''))
+    with contextlib.redirect_stdout(io.StringIO()):
+        with stage_profile.stage('import'):
+            module = importlib.import_module(spec['argv'][0][:-len('.py')])
+            load_libraries()
+        with stage_profile.stage('main'):
+            if script == 'rep0000':
+                # cli() сам печатает профиль и сбрасывает его, поэтому main напрямую
+                module.main(os.getcwd())
+            else:
+                module.main()
+        totals = stage_profile.totals()
+        stage_profile.report()
+    return totals
+
+
+# === Прогоны и сравнение с базой ===
+
+def best_of(runs):
+    """Лучшее время и наибольшая память из повторов"""
+    rss = [r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None]
+    return {'seconds': min(r['seconds'] for r in runs), 'peak_rss_mb': max(rss) if rss else None}
+
+
+def best_stage(runs):
+    """Лучшее время этапа из повторов; строк в секунду — по строкам, которые этап отметил сам"""
+    seconds = min(r['seconds'] for r in runs)
+    rows = runs[0]['rows']
+    return {'seconds': seconds, 'rows_per_sec': rows / seconds if rows and seconds else None}
+
+
+def bench_script(script, folder, rows, repeat):
+    spec = SCRIPTS[script]
+    runs = []
+    for _ in range(repeat):
+        clean_folder(folder)
+        seconds, rss, code, output = run_process(
+            [sys.executable, os.path.join(REPO_DIR, spec['argv'][0])] + spec['argv'][1:],
+            folder, spec.get('stdin', '')
+        )
+        if code != 0:
+            print(output[-2000:])
+            raise RuntimeError(f"{script} exited with code {code}")
+        runs.append({'seconds': seconds, 'peak_rss_mb': rss})
+
+    stage_runs = {}
+    for _ in range(repeat):
+        clean_folder(folder)
+        seconds, rss, code, output = run_process(
+            [sys.executable, os.path.abspath(__file__), '--stages-of', script], folder
+        )
+        if code != 0:
+            print(output[-2000:])
+            raise RuntimeError(f"{script} stages exited with code {code}")
+        for name, result in json.loads(output.strip().splitlines()[-1]).items():
+            stage_runs.setdefault(name, []).append(result)
+    clean_folder(folder)
+
+    result = best_of(runs)
+    result['rows_per_sec'] = rows / result['seconds']
+    result['stages'] = {}
+    for name, results in stage_runs.items():
+        result['stages'][name] = best_stage(results)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий относительно baseline: (ключ, метрика, было, стало)"""
+    regressions = []
+
+    def check(key, current, base):
+        if base['seconds'] >= MIN_COMPARABLE_SECONDS and current['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append((key, 'seconds', base['seconds'], current['seconds']))
+        if base.get('peak_rss_mb') and current.get('peak_rss_mb') \
+                and current['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append((key, 'peak_rss_mb', base['peak_rss_mb'], current['peak_rss_mb']))
+
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        check(key, current, base)
+        for name, stage in current['stages'].items():
+            if name in base.get('stages', {}):
+                check(f"{key}:{name}", stage, base['stages'][name])
+    return regressions
+
+
+def fmt_rss(value):
+    return f"{value:8.1f}" if value is not None else f"{'—':>8}"
+
+
+def print_results(results):
+    # Пиковый RSS — у процесса целиком: ru_maxrss только растёт, по этапам его не разделить
+    print("\n" + "=" * 72)
+    print(f"{'size/script:stage':<36}{'seconds':>10}{'peak RSS':>10}{'rows/s':>14}")
+    print("=" * 72)
+    for key, result in results.items():
+        print(f"{key:<36}{result['seconds']:>10.2f}  {fmt_rss(result['peak_rss_mb'])}{result['rows_per_sec']:>14,.0f}")
+        for name, stage in result['stages'].items():
+            label = "  " * (name.count('/') + 1) + name.rsplit('/', 1)[-1]
+            rate = f"{stage['rows_per_sec']:>14,.0f}" if stage['rows_per_sec'] else f"{'—':>14}"
+            print(f"{label:<36}{stage['seconds']:>10.2f}  {fmt_rss(None)}{rate}")
+    print("=" * 72)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Время, память и скорость скриптов отчётов на синтетических данных')
+    parser.add_argument('--sizes', nargs='+', default=['10k'],
+                        help='Размеры наборов: 10k, 100k, 1M, 5M (по умолчанию 10k)')
+    parser.add_argument('--scripts', nargs='+', choices=list(SCRIPTS), default=list(SCRIPTS),
+                        help='Какие скрипты мерить (по умолчанию все)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Сколько раз запускать каждый скрипт (по умолчанию 3)')
+    parser.add_argument('--data', default=make_test_data.DEFAULT_OUTPUT,
+                        help=f'Папка с наборами make_test_data.py (по умолчанию {make_test_data.DEFAULT_OUTPUT})')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Зерно для наборов, которые нужно создать (по умолчанию 1)')
+    parser.add_argument('--output', default=RESULTS_FILE,
+                        help=f'Куда сохранить результаты (по умолчанию {RESULTS_FILE})')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help=f'Файл базы для сравнения (по умолчанию {BASELINE_FILE})')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Записать результаты в базу вместо сравнения с ней')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Допустимый рост времени и памяти относительно базы (по умолчанию 0.2 = 20%%)')
+    parser.add_argument('--stages-of', choices=list(SCRIPTS), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.stages_of:
+        # Внутренний режим: этапы одного скрипта в этом процессе, результат — JSON в последней строке
+        print(json.dumps(run_stages(args.stages_of)))
+        return
+
+    results = {}
+    for rows in map(make_test_data.parse_size, args.sizes):
+        for script in args.scripts:
+            dataset = SCRIPTS[script]['dataset']
+            folder = make_test_data.dataset_folder(args.data, rows, dataset)
+            if not os.path.isdir(folder):
+                print(f"📦 Generating {folder} ...")
+                os.makedirs(folder)
+                make_test_data.GENERATORS[dataset](folder, rows, args.seed)
+            key = f"{make_test_data.size_label(rows)}/{script}"
+            print(f"⏱️ {key}")
+            results[key] = bench_script(script, os.path.abspath(folder), rows, args.repeat)
+
+    print_results(results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {args.output}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"💾 Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ No baseline ({args.baseline}); run with --save-baseline to create one.")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+    print(f"\n❌ Regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for key, metric, before, after in regressions:
+        print(f" - {key} {metric}: {before:.2f} → {after:.2f} ({after / before - 1:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
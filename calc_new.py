@@ -1,40 +1,82 @@
-import pandas as pd
+import argparse
+import time
+
 from pathlib import Path
 
+import run_metrics
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
 file_path = "OREC266246732627013632.csv"
 
-if not Path(file_path).exists():
-    print(f"Файл {file_path} не найден.")
-    exit(1)
-
-# Читаем CSV без заголовков, с точным указанием разделителя
-df = pd.read_csv(
-    file_path,
-    sep=";",
-    header=None,
-    names=["payment_id", "type", "amount", "currency", "fee", "fee_currency", "status", "timestamp"],
-    dtype=str  # читаем всё как строки сначала
-)
-
-# Преобразуем сумму в числовой формат (заменяем ',' → '.', если нужно — но у тебя точка)
-df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
-
-# Считаем общее количество строк (транзакций)
-total_transactions = len(df)
-
-# Фильтруем только CAPTURED и числовые суммы
-successful = df[
-    (df["status"] == "CAPTURED") &
-    df["amount"].notna()
-]
-
-successful_count = len(successful)
-total_amount = successful["amount"].sum()
-success_rate = (successful_count / total_transactions * 100) if total_transactions > 0 else 0
-
-# Вывод
-print("\n=== АНАЛИЗ CSV-ФАЙЛА ===")
-print(f"Всего транзакций: {total_transactions}")
-print(f"Успешных транзакций: {successful_count}")
-print(f"Success Rate: {success_rate:.2f}%")
-print(f"Оборот (CAPTURED): {total_amount:,.2f} RUB")
\ No newline at end of file
+OREC_COLUMNS = ["payment_id", "type", "amount", "currency", "fee", "fee_currency", "status", "timestamp"]
+
+
+def orec_stats(file_path):
+    """Всего транзакций, успешных (CAPTURED) и их оборот по OREC-файлу"""
+    # Читаем CSV без заголовков, с точным указанием разделителя
+    df = pd.read_csv(
+        file_path,
+        sep=";",
+        header=None,
+        names=OREC_COLUMNS,
+        dtype=str  # читаем всё как строки сначала
+    )
+
+    # Преобразуем сумму в числовой формат (заменяем ',' → '.', если нужно — но у тебя точка)
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+
+    # Считаем общее количество строк (транзакций)
+    total_transactions = len(df)
+
+    # Фильтруем только CAPTURED и числовые суммы
+    successful = df[
+        (df["status"] == "CAPTURED") &
+        df["amount"].notna()
+    ]
+
+    successful_count = len(successful)
+    total_amount = successful["amount"].sum()
+    success_rate = (successful_count / total_transactions * 100) if total_transactions > 0 else 0
+
+    return {
+        'total': total_transactions,
+        'rejected': int(df["amount"].isna().sum()),  # сумма не число
+        'successful': successful_count,
+        'amount': total_amount,
+        'success_rate': success_rate,
+    }
+
+
+def print_orec_stats(stats):
+    print("\n=== АНАЛИЗ CSV-ФАЙЛА ===")
+    print(f"Всего транзакций: {stats['total']}")
+    print(f"Успешных транзакций: {stats['successful']}")
+    print(f"Success Rate: {stats['success_rate']:.2f}%")
+    print(f"Оборот (CAPTURED): {stats['amount']:,.2f} RUB")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Итог по OREC-файлу')
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    run_metrics.start_from_args(args, 'calc_new')
+
+    if not Path(file_path).exists():
+        print(f"Файл {file_path} не найден.")
+        exit(1)
+
+    started = time.perf_counter()
+    stats = orec_stats(file_path)
+    run_metrics.file_parsed(file_path, time.perf_counter() - started)
+    run_metrics.file_rows(file_path, stats['total'], stats['rejected'])
+    print_orec_stats(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,86 @@
-import pandas as pd
+import argparse
 import glob
-from pathlib import Path
-
-# Находим все файлы по шаблону
-files = glob.glob("Transaction-*.xlsx")
-
-if not files:
-    print("Files not found. Ensure there are files starting with 'Transaction-' and ending with '.xlsx'")
-    print("Available files:")
-    for f in Path('.').glob('*'):
-        if f.is_file():
-            print(f"- {f.name}")
-    exit(1)
-
-print(f"Files found: {len(files)}")
-for i, file in enumerate(files, 1):
-    print(f"{i}. {file}")
-
-all_dfs = []
-for file in files:
-    try:
-        print(f"Processing: {Path(file).name}")
-        df = pd.read_excel(file, header=None, skiprows=1)
-        df.dropna(how='all', inplace=True)
-        if not df.empty:
-            all_dfs.append(df)
-    except Exception as e:
-        print(f"Error processing {file}: {e}")
-
-if not all_dfs:
-    print("No data to process.")
-    exit(1)
-
-# Объединяем
-full_df = pd.concat(all_dfs, ignore_index=True)
-
-# Определяем колонки вручную (на основе структуры)
-# Колонка 6 — это статус (начинаем с 0)
-# Колонка 7 — сумма в RUB
-full_df.columns = [f'col_{i}' for i in range(full_df.shape[1])]
-
-status_col = full_df['col_6']
-amount_col = full_df['col_7']
-
-# Только строки с CAPTURED и числовыми суммами
-valid = (status_col == 'CAPTURED') & pd.to_numeric(amount_col, errors='coerce').notna()
-successful = full_df[valid]
-total_amount = pd.to_numeric(successful['col_7']).sum()
-total_operations = len(full_df)
-successful_operations = len(successful)
-success_rate = successful_operations / total_operations * 100
-
-print("\n=== Analysis Results ===")
-print(f"Total operations: {total_operations}")
-print(f"Successful operations: {successful_operations}")
-print(f"Success Rate: {success_rate:.2f}%")
-print(f"Daily Turnover: {total_amount:,.2f} RUB")
\ No newline at end of file
+import os
+
+import run_metrics
+import stage_profile
+from lazy_imports import lazy_import
+from stage_profile import stage
+
+# Loaded with the first export, so a run without files does not pay for it
+transaction_reports = lazy_import('transaction_reports')
+
+
+def print_results(total_operations, successful_operations, total_amount):
+    success_rate = successful_operations / total_operations * 100
+
+    print("\n=== Analysis Results ===")
+    print(f"Total operations: {total_operations}")
+    print(f"Successful operations: {successful_operations}")
+    print(f"Success Rate: {success_rate:.2f}%")
+    print(f"Daily Turnover: {transaction_reports.format_amount(total_amount)} RUB")
+
+
+def print_stats_report(files, partials):
+    """Печатает итог по частичным результатам файлов; False, если данных нет."""
+    for file, part in zip(files, partials):
+        print(f"Processing: {os.path.basename(file)}")
+        if 'error' in part:
+            print(f"Error processing {file}: {part['error']}")
+
+    total = transaction_reports.merge_stats(partials)
+    if total['rows'] == 0:
+        print("No data to process.")
+        return False
+
+    print_results(total['rows'], total['successful'], total['amount'])
+    return True
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Success rate и оборот по Transaction-*.xlsx')
+    parser.add_argument('--stream', action='store_true',
+                        help='Потоковое чтение только колонок статуса и суммы (память не растёт с размером файлов)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Сколько файлов разбирать параллельно (по умолчанию 1)')
+    stage_profile.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    stage_profile.start_from_args(args)
+    run_metrics.start_from_args(args, 'calc_stats')
+
+    # Находим все файлы по шаблону
+    files = glob.glob("Transaction-*.xlsx")
+
+    if not files:
+        print("Files not found. Ensure there are files starting with 'Transaction-' and ending with '.xlsx'")
+        print("Available files:")
+        with os.scandir('.') as entries:
+            for f in entries:
+                if f.is_file():
+                    print(f"- {f.name}")
+        exit(1)
+
+    print(f"Files found: {len(files)}")
+    for i, file in enumerate(files, 1):
+        print(f"{i}. {file}")
+
+    # Каждый файл сводится к (строк, успешных, сумма), потом складываем
+    with stage('files'):
+        partials = transaction_reports.map_files_incremental(
+            transaction_reports.stats_partial, files, args.workers, stream=args.stream
+        )
+    for file, part in zip(files, partials):
+        run_metrics.file_rows(file, part.get('rows'), error=part.get('error'))
+    with stage('report'):
+        has_data = print_stats_report(files, partials)
+    if not has_data:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Deferred imports of the heavy libraries.
+
+pandas, numpy and openpyxl together take a few hundred milliseconds to
+import. The report modules get them through lazy_import, so importing a
+script (for --help, or a run that stops early because there are no files) is
+cheap; the library is actually loaded on first attribute access, e.g. the
+first pd.read_excel call. The same goes for the shared helper modules
+(transaction_reports and what it imports) and for standard modules only some
+runs need (tracemalloc for --profile, datetime for the metrics).
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Module name, loaded on first attribute access instead of now."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,230 @@
+"""
+Синтетические выгрузки для проверки скорости скриптов
+
+Для каждого размера создаётся папка с четырьмя наборами данных:
+  <output>/<size>/transactions/  Transaction-List-Date_*.xlsx  (calc_stats, angelina_report, 12oo)
+  <output>/<size>/orec/          OREC266246732627013632.csv    (calc_new)
+  <output>/<size>/mosteh/        mosteh_export.csv              (mosteh)
+  <output>/<size>/rep0000/       aggregated_data / *_19_00_00 / *_20_59_00 / *_00_00_00 CSV (rep0000)
+
+Данные детерминированы: одинаковые --seed и размер дают побайтово те же CSV
+и те же значения в xlsx. В выгрузки намеренно подмешаны пустые ячейки,
+мусор и статусы с пробелами — как в настоящих файлах.
+
+=== КАК ЗАПУСТИТЬ ===
+
+1. Наборы по 10 тысяч и 1 миллиону строк:
+   python make_test_data.py --sizes 10k 1M
+
+2. Только CSV для mosteh и rep0000:
+   python make_test_data.py --sizes 100k --only mosteh rep0000
+"""
+
+import argparse
+import os
+import random
+import time
+
+DATASETS = ['transactions', 'orec', 'mosteh', 'rep0000']
+
+DEFAULT_OUTPUT = 'bench_data'
+
+# На листе Excel не больше 1 048 576 строк, большие наборы делятся на файлы
+ROWS_PER_XLSX = 1_000_000
+
+EXPORT_DAY = '2026-01-19'
+
+TRANSACTION_HEADER = [
+    'Transaction ID', 'Created', 'Merchant Name', 'Last Updated', 'Completion Date',
+    'Type', 'Status', 'Amount', 'Currency',
+]
+
+# Статусы с весами, примерно как в дневной выгрузке
+TRANSACTION_STATUSES = [
+    ('CAPTURED', 60), ('DECLINED', 15), ('CANCELLED', 10), ('ERROR', 4),
+    ('REFUNDED', 3), ('PAID_OUT', 3), ('NEW', 3), (' captured ', 1), (None, 1),
+]
+
+OREC_STATUSES = [('CAPTURED', 70), ('DECLINED', 20), ('CANCELLED', 8), ('ERROR', 2)]
+
+MERCHANTS = [f'Merchant {i:03d}' for i in range(200)] + ['Pagsmile Limited', 'MyGames', 'Carusell']
+
+MOSTEH_COLUMNS = [
+    'id', 'partner.id', 'partner.name', 'pid', 'status', 'phone', 'amount',
+    'created', 'changed', 'payment_time', 'parameters', 'extra',
+]
+MOSTEH_PARTNERS = [('ООО МосТех', 30), ('мостех сервис', 10), ('ООО Ромашка', 40), ('Other', 20)]
+MOSTEH_FILE = 'mosteh_export.csv'
+MOSTEH_ENCODING = 'cp1251'
+MOSTEH_START_DATE = '2026-01-12'
+MOSTEH_END_DATE = '2026-01-15'
+
+# Файлы rep0000: имя, разделитель и доля строк (форматы как у настоящих выгрузок)
+REP0000_FILES = [
+    ('aggregated_data_2026-01-19.csv', ',', 0.4),
+    ('payouts_19_00_00.csv', ';', 0.25),
+    ('fat_pagsmile_20_59_00.csv', ',', 0.2),
+    ('fat_other_00_00_00.csv', ';', 0.15),
+]
+REP0000_IDS = ['4065', '4066', '4116', '3245', '3021', '101', '102', '103', '40650', 'AA1', '']
+
+
+def parse_size(text):
+    """'10k', '1M', '5m' или просто число строк"""
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    digits = text[:-1] if multiplier > 1 else text
+    return int(float(digits) * multiplier)
+
+
+def size_label(rows):
+    """Обратное к parse_size: 1000000 → '1M'"""
+    for suffix, unit in (('M', 1_000_000), ('k', 1_000)):
+        if rows >= unit and rows % unit == 0:
+            return f'{rows // unit}{suffix}'
+    return str(rows)
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def quote_csv(value, sep):
+    if sep in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def transaction_row(rng, i):
+    hour, minute, second = rng.randrange(24), rng.randrange(60), rng.randrange(60)
+    created = f'{EXPORT_DAY}T{hour:02d}:{minute:02d}:{second:02d}Z'
+    roll = rng.random()
+    if roll < 0.03:
+        created = None
+    elif roll < 0.04:
+        created = 'garbage'
+    elif roll < 0.07:
+        created = f'{EXPORT_DAY} {hour:02d}:{minute:02d}:{second:02d}'
+
+    amount = round(rng.uniform(1, 10000), 2)
+    roll = rng.random()
+    if roll < 0.02:
+        amount = None
+    elif roll < 0.03:
+        amount = 'n/a'
+    elif roll < 0.05:
+        amount = str(amount)
+
+    return [f'T{i:09d}', created, rng.choice(MERCHANTS), created, created, 'PAYMENT',
+            weighted(rng, TRANSACTION_STATUSES), amount, 'RUB']
+
+
+def make_transactions(folder, rows, seed):
+    # openpyxl и pandas (через calc_new) импортируются по месту: bench_reports.py
+    # импортирует этот модуль и не должен заранее грузить то, что меряет
+    from openpyxl import Workbook
+
+    rng = random.Random(f'{seed}:transactions')
+    files = max(1, -(-rows // ROWS_PER_XLSX))
+    written = 0
+    for n in range(files):
+        file_rows = min(ROWS_PER_XLSX, rows - written)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Transactions')
+        ws.append(['Transactions'])
+        ws.append(TRANSACTION_HEADER)
+        for i in range(written, written + file_rows):
+            ws.append(transaction_row(rng, i))
+        wb.save(os.path.join(folder, f'Transaction-List-Date_{EXPORT_DAY}T12_{n:02d}_00.xlsx'))
+        written += file_rows
+
+
+def make_orec(folder, rows, seed):
+    import calc_new
+
+    rng = random.Random(f'{seed}:orec')
+    with open(os.path.join(folder, calc_new.file_path), 'w', encoding='utf-8', newline='\n') as f:
+        for i in range(rows):
+            amount = f'{rng.uniform(10, 5000):.2f}' if rng.random() > 0.01 else ''
+            f.write(';'.join([f'p{i}', 'pay', amount, 'RUB', '0', 'RUB',
+                              weighted(rng, OREC_STATUSES), f'{EXPORT_DAY} {rng.randrange(24):02d}:00:00']) + '\n')
+
+
+def mosteh_parameters(rng):
+    roll = rng.random()
+    if roll < 0.3:
+        return '[]'
+    if roll < 0.4:
+        return ''
+    if roll < 0.9:
+        return f"[{{'name': 'account', 'value': '{rng.randrange(100000)}'}}, {{'name':  'service',  'value': '7'}}]"
+    return '{"raw": "a;b"}'
+
+
+def make_mosteh(folder, rows, seed):
+    rng = random.Random(f'{seed}:mosteh')
+    with open(os.path.join(folder, MOSTEH_FILE), 'w', encoding=MOSTEH_ENCODING, newline='\n') as f:
+        f.write(';'.join(MOSTEH_COLUMNS) + '\n')
+        for i in range(rows):
+            ts = f'2026-01-{rng.randint(10, 20):02d} {rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}'
+            payment_time = ts if rng.random() > 0.02 else ''
+            f.write(';'.join([
+                str(i), str(rng.randint(1, 9)), weighted(rng, MOSTEH_PARTNERS), f'P{i}',
+                rng.choice(['paid', 'new', 'failed']), f'+7900{rng.randint(1000000, 9999999)}',
+                f'{rng.uniform(10, 5000):.2f}', ts, ts, payment_time,
+                quote_csv(mosteh_parameters(rng), ';'), 'x',
+            ]) + '\n')
+
+
+def make_rep0000(folder, rows, seed):
+    rng = random.Random(f'{seed}:rep0000')
+    for name, sep, share in REP0000_FILES:
+        with open(os.path.join(folder, name), 'w', encoding='utf-8', newline='\n') as f:
+            f.write(sep.join(['merchant_id', 'merchant_name', 'Дата 1', 'Дата 2']) + '\n')
+            for i in range(max(1, int(rows * share))):
+                merchant = rng.choice(['Shop', 'Магазин', 'Store', 'Компания "Ромашка"']) + f' {i % 5000}'
+                old, new = rng.randint(0, 50000), rng.randint(0, 50000)
+                # В выгрузках с запятой числа идут с пробелами-разделителями тысяч
+                old_text = f'"{old:,}"'.replace(',', ' ') if sep == ',' else str(old)
+                f.write(sep.join([rng.choice(REP0000_IDS), quote_csv(merchant, sep), old_text, str(new)]) + '\n')
+
+
+GENERATORS = {
+    'transactions': make_transactions,
+    'orec': make_orec,
+    'mosteh': make_mosteh,
+    'rep0000': make_rep0000,
+}
+
+
+def dataset_folder(output, rows, dataset):
+    return os.path.join(output, size_label(rows), dataset)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Детерминированные синтетические выгрузки для бенчмарков')
+    parser.add_argument('--sizes', nargs='+', default=['10k'],
+                        help='Сколько строк в каждом наборе: 10k, 100k, 1M, 5M (по умолчанию 10k)')
+    parser.add_argument('--only', nargs='+', choices=DATASETS, default=DATASETS,
+                        help='Какие наборы создавать (по умолчанию все)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Зерно генератора (по умолчанию 1)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f'Куда складывать наборы (по умолчанию {DEFAULT_OUTPUT})')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    for rows in map(parse_size, args.sizes):
+        for dataset in args.only:
+            folder = dataset_folder(args.output, rows, dataset)
+            os.makedirs(folder, exist_ok=True)
+            start = time.perf_counter()
+            GENERATORS[dataset](folder, rows, args.seed)
+            print(f'✅ {folder}: {rows:,} rows in {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
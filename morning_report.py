@@ -0,0 +1,102 @@
+"""
+Все три отчёта по Transaction-*.xlsx за один проход
+
+Каждая выгрузка читается один раз, и из одной и той же таблицы считаются:
+  stats  — success rate и оборот (как calc_stats.py)
+  status — количество и сумма по статусам (как angelina_report.py)
+  noon   — транзакции до 12:00 по Москве по мерчантам (как 12oo.py)
+
+=== КАК ЗАПУСТИТЬ ===
+
+1. Все отчёты:
+   python morning_report.py
+
+2. Только выбранные, с колонкой времени без вопроса:
+   python morning_report.py --reports stats,noon --time_column 1 --workers 4
+"""
+
+import argparse
+import fnmatch
+import glob
+import importlib
+
+from transaction_reports import REPORTS, fused_partial, map_files_incremental
+
+import angelina_report
+import calc_stats
+
+# Имя 12oo.py не является идентификатором, поэтому импортируем по строке
+before_noon = importlib.import_module("12oo")
+
+NOON_PATTERN = "Transaction-List-Date_*.xlsx"
+
+
+def parse_reports(value):
+    reports = [r.strip() for r in value.split(',') if r.strip()]
+    unknown = [r for r in reports if r not in REPORTS]
+    if unknown or not reports:
+        raise argparse.ArgumentTypeError(f"неизвестные отчёты: {', '.join(unknown) or value}; доступны: {', '.join(REPORTS)}")
+    return [r for r in REPORTS if r in reports]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Все отчёты по Transaction-*.xlsx за одно чтение файлов')
+    parser.add_argument('--reports', type=parse_reports, default=list(REPORTS),
+                        help=f"Какие отчёты выводить через запятую (по умолчанию все: {','.join(REPORTS)})")
+    parser.add_argument('--time_column', type=int,
+                        help='Индекс колонки времени для noon (если не указан, будет вопрос)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Сколько файлов разбирать параллельно (по умолчанию 1)')
+    return parser.parse_args()
+
+
+def print_reports(files, partials, reports, noon_files, time_col):
+    """Печатает выбранные отчёты по частичным результатам fused_partial"""
+    if 'stats' in reports:
+        print("\n" + "#"*60 + "\n# stats (calc_stats.py)\n" + "#"*60)
+        calc_stats.print_stats_report(files, [p['stats'] for p in partials])
+
+    if 'status' in reports:
+        print("\n" + "#"*60 + "\n# status (angelina_report.py)\n" + "#"*60)
+        angelina_report.print_status_report(files, [p['status'] for p in partials])
+
+    if 'noon' in reports:
+        print("\n" + "#"*60 + "\n# noon (12oo.py)\n" + "#"*60 + "\n")
+        if noon_files:
+            noon_partials = [p['noon'] for f, p in zip(files, partials) if f in noon_files]
+            before_noon.print_before_noon_report(noon_files, noon_partials, time_col)
+        else:
+            print(f"❌ No files found matching {NOON_PATTERN}")
+
+
+def main():
+    args = parse_arguments()
+
+    files = sorted(glob.glob("Transaction-*.xlsx"))
+    if not files:
+        print("❌ No files matching 'Transaction-*.xlsx' found in the current directory.")
+        exit(1)
+
+    print(f"📁 Files found: {len(files)}")
+    for f in files:
+        print(f" - {f}")
+
+    # 12oo.py смотрит только на Transaction-List-Date_*.xlsx
+    noon_files = [f for f in files if fnmatch.fnmatch(f, NOON_PATTERN)]
+    reports = args.reports
+    time_col = 2
+    if 'noon' in reports and noon_files:
+        time_col = args.time_column
+        if time_col is None:
+            print("\n" + "="*60)
+            time_col = before_noon.choose_time_column(noon_files[0])
+            print("="*60)
+
+    # Один проход по файлам: для каждого файла все нужные отчёты сразу
+    partials = map_files_incremental(fused_partial, files, args.workers, reports=tuple(reports), time_col=time_col)
+
+    print_reports(files, partials, reports, noon_files, time_col)
+
+
+if __name__ == "__main__":
+    main()
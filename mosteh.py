@@ -14,15 +14,83 @@
   Скрипт автоматически подберет год из данных, если это необходимо
 """
 
-import pandas as pd
 import argparse
+import codecs
+import json
 from datetime import datetime
 import re
-import openpyxl
+import time
 import os
 from pathlib import Path
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Border, Side, Alignment, Font
+
+import run_metrics
+import stage_profile
+from lazy_imports import lazy_import
+from stage_profile import stage
+
+np = lazy_import('numpy')
+openpyxl = lazy_import('openpyxl')
+pd = lazy_import('pandas')
+
+ENCODINGS = ['utf-8-sig', 'cp1251', 'cp866', 'iso-8859-5', 'utf-16', 'windows-1252']
+
+# Сколько байт из начала файла смотрим, чтобы определить кодировку
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+# Определённые кодировки запоминаются по пути к файлу
+ENCODING_CACHE_FILE = '.mosteh_encodings.json'
+
+# Форматы payment_time, в порядке проверки
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',  # 2025-01-15 10:30:00
+    '%d.%m.%Y %H:%M',     # 15.01.2025 10:30
+    '%Y-%m-%dT%H:%M:%S',  # 2025-01-15T10:30:00
+    '%d.%m.%Y',           # 15.01.2025
+    '%Y-%m-%d'            # 2025-01-15
+]
+
+# Позиции символов 'ГГГГ-ММ-ДДTЧЧ:ММ', из которых собирается 'ММ/ДД/ГГ ЧЧ:ММ'
+# (None — разделитель, который подставляется отдельно)
+EXCEL_DATE_LAYOUT = [5, 6, None, 8, 9, None, 2, 3, None, 11, 12, 13, 14, 15]
+EXCEL_DATE_SEPARATORS = {2: '/', 5: '/', 8: ' '}
+
+# Сколько непустых значений берём для определения формата даты
+DATE_SAMPLE_SIZE = 200
+
+# Колонки отчета в нужном порядке; из CSV читаются только они
+REPORT_COLUMNS = [
+    'id', 'partner.id', 'partner.name', 'pid', 'status',
+    'phone', 'amount', 'created', 'changed',
+    'payment_time', 'parameters'
+]
+
+PARTNER_NAME = 'МосТех'
+
+# По сколько строк CSV читается и фильтруется за раз
+CSV_CHUNK_ROWS = 100_000
+
+# Ширина колонок отчета для лучшей читаемости
+COLUMN_WIDTHS = {
+    'A': 10,  # id
+    'B': 10,  # partner.id
+    'C': 40,  # partner.name
+    'D': 15,  # pid
+    'E': 12,  # status
+    'F': 15,  # phone
+    'G': 12,  # amount
+    'H': 18,  # created
+    'I': 18,  # changed
+    'J': 18,  # payment_time
+    'K': 70   # parameters
+}
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
 
 def find_csv_file(directory):
     """Находит первый CSV файл в указанной директории"""
@@ -37,17 +105,58 @@ def parse_arguments():
     parser.add_argument('--output', type=str, help='Путь к выходному XLSX файлу (по умолчанию report_<дата>.xlsx в текущей директории)')
     parser.add_argument('--start_date', type=str, required=True, help='Начальная дата в формате ГГГГ-ММ-ДД')
     parser.add_argument('--end_date', type=str, required=True, help='Конечная дата в формате ГГГГ-ММ-ДД')
+    stage_profile.add_arguments(parser)
+    run_metrics.add_arguments(parser)
     return parser.parse_args()
 
-def format_date_for_excel(date_str):
-    """Преобразует дату в формат ММ/ДД/ГГ ЧЧ:ММ для Excel"""
-    try:
-        # Пытаемся распарсить дату из формата '2026-01-15 20:21:51'
-        dt = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-        # Форматируем в нужный формат ММ/ДД/ГГ ЧЧ:ММ
-        return dt.strftime('%m/%d/%y %H:%M')
-    except:
-        return date_str
+def infer_date_format(dates, sample_size=DATE_SAMPLE_SIZE, formats=DATE_FORMATS):
+    """Подбирает формат из formats по небольшой выборке непустых значений.
+
+    Берётся первый формат, который разбирает хотя бы одно значение выборки.
+    Если выборка ничего не дала, форматы проверяются на всей колонке, как раньше.
+    Выборка может пропустить формат, стоящий в списке раньше, поэтому
+    read_report_rows проверяет выбор на всех строках (earlier_date_format).
+    """
+    sample = dates.dropna().head(sample_size)
+    for candidates in (sample, dates):
+        for fmt in formats:
+            try:
+                if pd.to_datetime(candidates, format=fmt, errors='coerce').notna().any():
+                    return fmt
+            except Exception as e:
+                print(f"Ошибка при преобразовании с форматом {fmt}: {str(e)}")
+        if len(sample) == len(dates.dropna()):
+            break
+    return None
+
+def earlier_date_format(dates, fmt):
+    """Первый формат раньше fmt в DATE_FORMATS, который разбирает что-то из dates, иначе None.
+
+    Раньше формат выбирался по всей колонке: первый из списка, который
+    разобрал хоть одно значение. Если такой нашелся — выборка ошиблась.
+    """
+    dates = dates.dropna()
+    if dates.empty:
+        return None
+    return infer_date_format(dates, sample_size=len(dates), formats=DATE_FORMATS[:DATE_FORMATS.index(fmt)])
+
+def format_dates_for_excel(dates):
+    """Преобразует колонку дат в формат ММ/ДД/ГГ ЧЧ:ММ для Excel.
+
+    Значения не в формате '2026-01-15 20:21:51' остаются как есть.
+    """
+    parsed = pd.to_datetime(dates, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    valid = parsed.notna().to_numpy()
+    result = dates.astype(object).to_numpy(copy=True)
+    if valid.any():
+        # 'ГГГГ-ММ-ДДTЧЧ:ММ' целиком в C, дальше только переставляем символы
+        iso = np.datetime_as_string(parsed[valid].to_numpy().astype('datetime64[m]'), unit='m')
+        chars = iso.astype('U16').view('U1').reshape(-1, 16)
+        out = chars[:, [pos if pos is not None else 0 for pos in EXCEL_DATE_LAYOUT]]
+        for pos, sep in EXCEL_DATE_SEPARATORS.items():
+            out[:, pos] = sep
+        result[valid] = np.ascontiguousarray(out).view('U14').ravel().astype(object)
+    return pd.Series(result, index=dates.index, name=dates.name)
 
 def clean_parameters(param_str):
     """Очищает и форматирует поле parameters для отображения в Excel"""
@@ -66,80 +175,145 @@ def clean_parameters(param_str):
         parts = param_str.split("}, {")
         cleaned_parts = []
         for part in parts:
-            cleaned_part = re.sub(r'\s+', ' ', part.strip())
+            cleaned_part = WHITESPACE_RE.sub(' ', part.strip())
             if cleaned_part:
                 cleaned_parts.append(cleaned_part)
         return "], [".join(["{" + p + "}" for p in cleaned_parts])
     
     return param_str
 
-def try_read_csv(file_path, encodings=None):
-    """Пытается прочитать CSV файл с разными кодировками"""
-    if encodings is None:
-        encodings = ['utf-8-sig', 'cp1251', 'cp866', 'iso-8859-5', 'utf-16', 'windows-1252']
-    
+def clean_parameters_column(params):
+    """clean_parameters для всей колонки: каждое различное значение чистится один раз.
+
+    Значения в parameters сильно повторяются, поэтому колонка сначала
+    сводится к уникальным значениям (factorize), а результат раскладывается
+    обратно по строкам.
+    """
+    codes, uniques = pd.factorize(params)
+    cleaned = np.array([clean_parameters(value) for value in uniques] + [""], dtype=object)
+    # Код -1 (пустое значение) попадает на последний элемент — ""
+    result = pd.Series(cleaned[codes], index=params.index, name=params.name)
+    
+    if len(params):
+        hits = len(params) - len(uniques)
+        print(f"Очистка parameters: {len(params)} значений, {len(uniques)} уникальных, "
+              f"попаданий в кэш {hits / len(params):.1%}")
+    return result
+
+def load_encoding_cache():
+    try:
+        with open(ENCODING_CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_encoding_cache(cache):
+    try:
+        with open(ENCODING_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+    except OSError as e:
+        print(f"Не удалось сохранить кэш кодировок: {e}")
+
+
+def decodes(sample, encoding):
+    """Проверяет, декодируется ли кусок файла (обрезанный символ в конце не считается ошибкой)"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_encoding(file_path, encodings, sample_size=ENCODING_SAMPLE_BYTES):
+    """Определяет кодировку по началу файла: сначала BOM, потом пробное декодирование"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
     for encoding in encodings:
+        if decodes(sample, encoding):
+            return encoding
+    return None
+
+
+def read_whole_csv(file_path, encoding):
+    return pd.read_csv(file_path, sep=';', encoding=encoding, on_bad_lines='warn')
+
+def try_read_csv(file_path, encodings=None, reader=read_whole_csv):
+    """Читает CSV файл, определив кодировку заранее.
+
+    Кодировка определяется по первым ENCODING_SAMPLE_BYTES байтам и
+    запоминается для этого файла (вместе с его размером и временем
+    изменения) в ENCODING_CACHE_FILE, так что обычно
+    файл разбирается ровно один раз. Если разбор всё же не удался,
+    пробуются остальные кодировки по порядку.
+
+    reader(file_path, encoding) выполняет само чтение; по умолчанию
+    загружается весь файл.
+    """
+    if encodings is None:
+        encodings = ENCODINGS
+
+    cache = load_encoding_cache()
+    source = os.path.abspath(file_path)
+    st = os.stat(file_path)
+    stamp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    # Кодировка из кэша годится, только если файл не менялся: cp1251
+    # «декодирует» почти любые байты, так что проверкой сэмпла подмену
+    # UTF-8 выгрузки под тем же именем не поймать
+    entry = cache.get(source)
+    cached = None
+    if isinstance(entry, dict) and all(entry.get(key) == value for key, value in stamp.items()):
+        cached = entry.get('encoding')
+
+    detected = cached or detect_encoding(file_path, encodings)
+    if detected:
+        how = "из кэша" if cached else "по началу файла"
+        print(f"Определена кодировка {detected} ({how})")
+    candidates = [detected] if detected else []
+    candidates += [e for e in encodings if e != detected]
+
+    # Повтор с другой кодировкой — только при ошибке декодирования; прочие
+    # ошибки чтения (нет колонки, неверная дата) перечитыванием не исправить
+    for encoding in candidates:
         try:
             print(f"Попытка чтения с кодировкой {encoding}...")
-            df = pd.read_csv(file_path, sep=';', encoding=encoding, on_bad_lines='warn')
+            result = reader(file_path, encoding)
             print(f"Успешно загружено с кодировкой {encoding}")
-            return df, encoding
-        except Exception as e:
+            if cache.get(source) != dict(stamp, encoding=encoding):
+                cache[source] = dict(stamp, encoding=encoding)
+                save_encoding_cache(cache)
+            return result, encoding
+        except UnicodeError as e:
             print(f"Не удалось загрузить с кодировкой {encoding}: {str(e)}")
     
-    raise ValueError("Не удалось прочитать файл ни с одной из доступных кодировок")
+    raise UnicodeError("Не удалось прочитать файл ни с одной из доступных кодировок")
 
-def generate_report(input_file, output_file, start_date, end_date):
-    print(f"Начало обработки данных. Диапазон дат: {start_date} - {end_date}")
-    
-    # Пытаемся прочитать файл с разными кодировками
-    try:
-        df, used_encoding = try_read_csv(input_file)
-        print(f"Файл успешно загружен с кодировкой: {used_encoding}")
-        print(f"Загружено {len(df)} записей из файла")
-    except Exception as e:
-        print(f"Критическая ошибка при чтении файла {input_file}:")
-        print(str(e))
-        print("\nДоступные кодировки: 'utf-8-sig', 'cp1251', 'cp866', 'iso-8859-5', 'utf-16', 'windows-1252'")
-        print("Попробуйте изменить кодировку файла вручную и повторить попытку.")
-        return
-            
-    
-    # Фильтрация по "МосТех" в названии партнера
-    df = df[df['partner.name'].str.contains('МосТех', case=False, na=False)]
-    print(f"После фильтрации по 'МосТех': {len(df)} записей")
-    
-    # Преобразуем даты для фильтрации
+def resolve_date_window(df, fmt, start_date, end_date):
+    """Разбирает payment_time и возвращает границы фильтра по датам.
+
+    Год берется из первой разобранной даты: если он не совпадает с годом
+    в start_date/end_date, границы переносятся на год из данных.
+    """
     print(f"\nПервые 5 дат в payment_time:")
     print(df['payment_time'].head())
     
-    # Пробуем разные форматы дат
-    date_formats = [
-        '%Y-%m-%d %H:%M:%S',  # 2025-01-15 10:30:00
-        '%d.%m.%Y %H:%M',     # 15.01.2025 10:30
-        '%Y-%m-%dT%H:%M:%S',  # 2025-01-15T10:30:00
-        '%d.%m.%Y',           # 15.01.2025
-        '%Y-%m-%d'            # 2025-01-15
-    ]
-    
-    # Пытаемся преобразовать даты разными способами
-    for fmt in date_formats:
-        try:
-            df['payment_time_dt'] = pd.to_datetime(df['payment_time'], format=fmt, errors='coerce')
-            if not df['payment_time_dt'].isna().all():
-                print(f"\nУспешное преобразование дат с форматом: {fmt}")
-                print("Примеры преобразованных дат:")
-                print(df[['payment_time', 'payment_time_dt']].head())
-                break
-        except Exception as e:
-            print(f"Ошибка при преобразовании с форматом {fmt}: {str(e)}")
+    if fmt is not None:
+        df['payment_time_dt'] = pd.to_datetime(df['payment_time'], format=fmt, errors='coerce')
+        print(f"\nУспешное преобразование дат с форматом: {fmt}")
+        print("Примеры преобразованных дат:")
+        print(df[['payment_time', 'payment_time_dt']].head())
     else:
         print("\nНе удалось определить формат даты. Используем автоматическое определение.")
         df['payment_time_dt'] = pd.to_datetime(df['payment_time'], errors='coerce')
     
     # Определяем год из данных
-    if not df.empty and 'payment_time_dt' in df.columns and not df['payment_time_dt'].isna().all():
-        data_year = df['payment_time_dt'].dt.year.dropna().iloc[0]
+    if not df.empty and not df['payment_time_dt'].isna().all():
+        data_year = int(df['payment_time_dt'].dt.year.dropna().iloc[0])
         print(f"\nГод в данных: {data_year}")
         
         # Обновляем год в датах фильтрации, если он не совпадает
@@ -156,61 +330,164 @@ def generate_report(input_file, output_file, start_date, end_date):
     end_datetime = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
     
     print(f"\nФильтрация по датам с {start_datetime} по {end_datetime}")
+    return start_datetime, end_datetime
+
+def read_report_rows(file_path, encoding, start_date, end_date, chunk_rows=CSV_CHUNK_ROWS, date_format=None):
+    """Читает CSV частями и оставляет только строки отчета.
+
+    Из файла берутся только REPORT_COLUMNS, а фильтры по партнеру и по
+    payment_time применяются к каждой части сразу, так что в памяти
+    остаются лишь подходящие строки. Строки партнера копятся, только пока
+    по ним не определены формат даты и год (обычно это первая же часть).
+
+    Если дальше в файле встречаются даты в формате, который в DATE_FORMATS
+    стоит раньше выбранного, файл читается заново с этим форматом
+    (date_format) — как если бы формат подбирался по всей колонке.
+    """
+    formats = DATE_FORMATS if date_format is None else [date_format]
+    chunks = pd.read_csv(
+        file_path, sep=';', encoding=encoding, on_bad_lines='warn',
+        usecols=lambda col: col in REPORT_COLUMNS, dtype={'partner.name': str},
+        chunksize=chunk_rows
+    )
     
-    # Фильтруем по дате оплаты (payment_time)
-    df_filtered = df[
-        (df['payment_time_dt'].notna()) & 
-        (df['payment_time_dt'] >= start_datetime) & 
-        (df['payment_time_dt'] <= end_datetime)
-    ]
+    total_rows = 0
+    partner_rows = 0
+    bad_dates = 0  # строки партнера с неразбираемым payment_time
+    pending = []   # строки партнера, пока неизвестны формат и год
+    window = None  # (fmt, начало, конец)
+    kept = []
+    min_dt = max_dt = None
+    
+    def keep(part):
+        """Фильтрует part по датам; возвращает формат, с которым надо читать заново, или None"""
+        nonlocal min_dt, max_dt, bad_dates
+        fmt, start_datetime, end_datetime = window
+        if 'payment_time_dt' not in part:
+            part['payment_time_dt'] = pd.to_datetime(part['payment_time'], format=fmt, errors='coerce')
+        dt = part['payment_time_dt']
+        if fmt is not None and dt.isna().any():
+            earlier = earlier_date_format(part.loc[dt.isna(), 'payment_time'], fmt)
+            if earlier is not None:
+                return earlier
+        bad_dates += int(dt.isna().sum())
+        if dt.notna().any():
+            min_dt = dt.min() if min_dt is None else min(min_dt, dt.min())
+            max_dt = dt.max() if max_dt is None else max(max_dt, dt.max())
+        kept.append(part[dt.notna() & (dt >= start_datetime) & (dt <= end_datetime)])
+        return None
+    
+    with chunks:
+        for chunk in chunks:
+            total_rows += len(chunk)
+            
+            # Фильтрация по "МосТех" в названии партнера
+            chunk = chunk[chunk['partner.name'].str.contains(PARTNER_NAME, case=False, na=False)]
+            partner_rows += len(chunk)
+            
+            if window is None:
+                # Определяем формат по небольшой выборке строк партнера
+                pending.append(chunk)
+                buffered = pd.concat(pending)
+                fmt = infer_date_format(buffered['payment_time'], formats=formats)
+                if fmt is None:
+                    continue
+                window = (fmt,) + resolve_date_window(buffered, fmt, start_date, end_date)
+                pending = []
+                chunk = buffered
+            
+            earlier = keep(chunk)
+            if earlier is not None:
+                print(f"\nВ файле есть даты в формате {earlier}, он проверяется раньше {window[0]} — читаем заново")
+                return read_report_rows(file_path, encoding, start_date, end_date, chunk_rows, earlier)
+    
+    if window is None:
+        # Формат так и не определился: разбираем все строки партнера автоматически
+        buffered = pd.concat(pending) if pending else pd.DataFrame(columns=REPORT_COLUMNS)
+        window = (None,) + resolve_date_window(buffered, None, start_date, end_date)
+        keep(buffered)
+    
+    df_filtered = pd.concat(kept)
+    run_metrics.file_rows(file_path, total_rows, bad_dates)
+    print(f"\nЗагружено {total_rows} записей из файла")
+    print(f"После фильтрации по '{PARTNER_NAME}': {partner_rows} записей")
     
     # Дополнительная отладочная информация
     if not df_filtered.empty:
         print("\nПримеры отфильтрованных записей:")
         print(df_filtered[['payment_time', 'payment_time_dt']].head())
     
-    print(f"После фильтрации по датам: {len(df_filtered)} записей из {len(df)}")
+    print(f"После фильтрации по датам: {len(df_filtered)} записей из {partner_rows}")
     
     # Если после фильтрации нет записей, выводим диапазон дат в данных
-    if len(df_filtered) == 0 and len(df) > 0:
+    if len(df_filtered) == 0 and partner_rows > 0:
         print("\nДиапазон дат в данных:")
-        print(f"Минимальная дата: {df['payment_time_dt'].min()}")
-        print(f"Максимальная дата: {df['payment_time_dt'].max()}")
+        print(f"Минимальная дата: {min_dt if min_dt is not None else pd.NaT}")
+        print(f"Максимальная дата: {max_dt if max_dt is not None else pd.NaT}")
     
-    df = df_filtered
+    return df_filtered
+
+def generate_report(input_file, output_file, start_date, end_date):
+    print(f"Начало обработки данных. Диапазон дат: {start_date} - {end_date}")
     
-    # Выбираем только нужные колонки в правильном порядке
-    required_columns = [
-        'id', 'partner.id', 'partner.name', 'pid', 'status',
-        'phone', 'amount', 'created', 'changed',
-        'payment_time', 'parameters'
-    ]
+    # Читаем файл частями, сразу отбрасывая лишние строки и колонки
+    try:
+        with stage('read_csv') as st:
+            started = time.perf_counter()
+            df, used_encoding = try_read_csv(
+                input_file,
+                reader=lambda path, encoding: read_report_rows(path, encoding, start_date, end_date)
+            )
+            run_metrics.file_parsed(input_file, time.perf_counter() - started)
+            st.rows = len(df)
+        print(f"Файл успешно загружен с кодировкой: {used_encoding}")
+    except Exception as e:
+        run_metrics.file_rows(input_file, error=e)
+        print(f"Критическая ошибка при чтении файла {input_file}:")
+        print(str(e))
+        if isinstance(e, UnicodeError):
+            print(f"\nДоступные кодировки: {', '.join(repr(e) for e in ENCODINGS)}")
+            print("Попробуйте изменить кодировку файла вручную и повторить попытку.")
+        return
     
     # Создаем новый DataFrame только с нужными колонками
-    report_df = df[required_columns].copy()
+    report_df = df[REPORT_COLUMNS].copy()
     
     # Форматируем даты для Excel
-    report_df['created'] = report_df['created'].apply(format_date_for_excel)
-    report_df['changed'] = report_df['changed'].apply(format_date_for_excel)
-    report_df['payment_time'] = report_df['payment_time'].apply(format_date_for_excel)
+    with stage('format_dates') as st:
+        st.rows = len(report_df)
+        for col in ['created', 'changed', 'payment_time']:
+            report_df[col] = format_dates_for_excel(report_df[col])
     
     # Очищаем поле parameters
-    report_df['parameters'] = report_df['parameters'].apply(clean_parameters)
+    with stage('clean_parameters') as st:
+        st.rows = len(report_df)
+        report_df['parameters'] = clean_parameters_column(report_df['parameters'])
     
-    # Сохраняем в Excel
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        report_df.to_excel(writer, index=False, sheet_name='Лист1')
-    
-    # Применяем стилизацию к Excel файлу
-    apply_excel_formatting(output_file)
+    # Сохраняем в Excel сразу со стилизацией
+    with stage('write_excel') as st:
+        st.rows = len(report_df)
+        write_excel_report(report_df, output_file)
     
     print(f"Отчет успешно сгенерирован и сохранен в {output_file}")
     print(f"В отчет включено {len(report_df)} записей")
 
-def apply_excel_formatting(output_file):
-    """Применяет форматирование к Excel файлу для соответствия образцу"""
-    wb = openpyxl.load_workbook(output_file)
-    ws = wb['Лист1']
+def excel_column_values(series):
+    """Значения колонки для записи в Excel: пустые ячейки — None, числа — обычные int/float"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def write_excel_report(report_df, output_file):
+    """Записывает отчет в Excel за один проход, сразу со стилями образца
+
+    Книга пишется в режиме write_only: строки уходят в файл по мере
+    добавления, а у каждой колонки одна ячейка-шаблон с уже назначенным
+    стилем, так что стиль не создается заново для каждой ячейки.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Border, Side, Alignment, Font
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Лист1')
     
     # Задаем стили границ
     thin_border = Border(
@@ -219,40 +496,39 @@ def apply_excel_formatting(output_file):
         top=Side(style='thin'), 
         bottom=Side(style='thin')
     )
-    
-    # Применяем заголовки в первой строке
+    wrap = Alignment(wrap_text=True)
     header_font = Font(bold=True)
-    for cell in ws[1]:
-        cell.font = header_font
-    
-    # Применяем границы ко всем ячейкам
-    for row in ws.iter_rows():
-        for cell in row:
-            cell.border = thin_border
-            cell.alignment = Alignment(wrap_text=True)
-    
-    # Настраиваем ширину колонок для лучшей читаемости
-    column_widths = {
-        'A': 10,  # id
-        'B': 10,  # partner.id
-        'C': 40,  # partner.name
-        'D': 15,  # pid
-        'E': 12,  # status
-        'F': 15,  # phone
-        'G': 12,  # amount
-        'H': 18,  # created
-        'I': 18,  # changed
-        'J': 18,  # payment_time
-        'K': 70   # parameters
-    }
-    
-    for col, width in column_widths.items():
+    
+    # Ширину колонок нужно задать до первой строки
+    for col, width in COLUMN_WIDTHS.items():
         ws.column_dimensions[col].width = width
     
+    def styled_cell(value=None, font=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.border = thin_border
+        cell.alignment = wrap
+        if font is not None:
+            cell.font = font
+        return cell
+    
+    # Заголовки в первой строке
+    ws.append([styled_cell(str(name), header_font) for name in report_df.columns])
+    
+    # Строка пишется в файл сразу при append, поэтому ячейки-шаблоны
+    # можно переиспользовать, меняя только значение
+    cells = [styled_cell() for _ in report_df.columns]
+    columns = [excel_column_values(report_df[col]) for col in report_df.columns]
+    for values in zip(*columns):
+        for cell, value in zip(cells, values):
+            cell.value = value
+        ws.append(cells)
+    
     wb.save(output_file)
 
 def main():
     args = parse_arguments()
+    stage_profile.start_from_args(args)
+    run_metrics.start_from_args(args, 'mosteh')
     
     # Проверяем корректность формата дат
     try:
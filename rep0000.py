@@ -1,7 +1,22 @@
-import pandas as pd
+import argparse
+import codecs
+import contextlib
+import csv
+import io
+import json
 import os
 import sys
 import re
+import traceback
+
+import run_metrics
+import stage_profile
+from lazy_imports import lazy_import
+from stage_profile import stage
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+transaction_reports = lazy_import('transaction_reports')
 
 SPECIAL_MERCHANTS = [
     ("Carusell/WhiteBird", "AA195783946319400960"),
@@ -16,6 +31,27 @@ HIDE_IDS = ['4065', '4066', '4067', '4068', '4069', '4085', '4116',
             '4117', '4119', '4246', '4247', '4252', '4255', '4258',
             '4261', '4268', '4271', '4273']
 
+# ID скрывается, если содержит любой из HIDE_IDS как подстроку
+HIDE_IDS_RE = re.compile('|'.join(re.escape(hide_id) for hide_id in HIDE_IDS))
+
+def is_hidden_id(merchant_id):
+    """Нужно ли скрыть ID мерчанта (содержит ли он какой-нибудь из HIDE_IDS)"""
+    return bool(HIDE_IDS) and HIDE_IDS_RE.search(merchant_id) is not None
+
+# Сколько байт из начала CSV смотрим, чтобы определить его формат
+CSV_SAMPLE_BYTES = 64 * 1024
+CSV_DELIMITERS = ',;\t|'
+CSV_ENCODINGS = ['utf-8-sig', 'cp1251']
+
+# Определённый формат запоминается по типу файла (classify_file) в папке с выгрузками
+DIALECT_CACHE_FILE = '.rep0000_dialects.json'
+
+# Там же реестр найденных колонок (мерчант, ID, значения) по типу файла и заголовку
+SCHEMA_CACHE_FILE = '.rep0000_schemas.json'
+
+# При параллельной обработке подробный вывод по каждому файлу пишется сюда
+LOG_DIR = 'rep0000_logs'
+
 def get_special_merchant_data():
     """Запрашивает у пользователя данные для специальных аккаунтов"""
     print("\n" + "="*80)
@@ -87,18 +123,8 @@ def calculate_change(old, new):
         sign = "+" if pct >= 0 else ""
         return f"{emoji} {sign}{pct:.2f}%"
 
-def normalize_df(df, source_type, excluded_merchant_ids=None, keep_zero_rows=False):
-    if excluded_merchant_ids is None:
-        excluded_merchant_ids = []
-    """Приводит df к merchant_name, date1, date2"""
-    print(f"\nОбработка файла типа: {source_type}")
-    print("Доступные колонки:", list(df.columns))
-    
-    # Выводим информацию о типах данных в колонках
-    print("\nТипы данных в колонках:")
-    for col in df.columns:
-        print(f"- {col}: {df[col].dtype}, пример: {df[col].iloc[0] if len(df) > 0 else 'нет данных'}")
-    
+def find_key_columns(df):
+    """Находит колонки с ID и названием мерчанта по ключевым словам и типам данных"""
     # Ищем колонки с ID и названиями мерчантов
     merchant_col = None
     id_col = None
@@ -143,53 +169,14 @@ def normalize_df(df, source_type, excluded_merchant_ids=None, keep_zero_rows=Fal
     elif merchant_col is None:
         merchant_col = df.columns[0]
     
-    # Очищаем названия мерчантов и ID
-    df[merchant_col] = df[merchant_col].astype(str).str.strip().str.replace('"', '').str.strip()
-    if id_col != merchant_col:
-        df[id_col] = df[id_col].astype(str).str.strip().str.replace('"', '').str.strip()
-    
-    # Удаляем пустые строки
-    df = df[df[merchant_col] != '']
-    df = df[df[merchant_col].str.lower() != 'nan']
-    
-    # Примечание: не удаляем строки с excluded_merchant_ids здесь —
-    # они будут обрабатываться и отображаться в полном отчёте (process_files соберёт их отдельно).
-    
-    # Объединяем ID и название мерчанта, если это разные колонки
-    # Исключение для определенных мерчантов, где ID не нужен
-    if id_col != merchant_col and id_col in df.columns:
-        # Используем глобальный список HIDE_IDS
-        
-        # Функция для форматирования ID и названия
-        def format_merchant(row):
-            merchant_id = str(row[id_col]).strip()
-            merchant_name = str(row[merchant_col]).strip()
-            
-            # Проверяем, нужно ли скрывать ID для этого мерчан��а
-            if any(hide_id in merchant_id for hide_id in HIDE_IDS):
-                return merchant_name
-            
-            # Проверяем, есть ли уже ID в названии
-            if merchant_id and not merchant_name.startswith(merchant_id):
-                return f"{merchant_id} {merchant_name}"
-            return merchant_name
-        
-        # Применяем форматирование
-        df[merchant_col] = df.apply(format_merchant, axis=1)
-    
-    # Сохраняем оригинальный ID в отдельной колонке, чтобы потом можно было показать скрытые ID в полном отчёте
-    if id_col in df.columns:
-        df['merchant_id'] = df[id_col].astype(str).str.strip()
-    else:
-        df['merchant_id'] = ''
-    
-    # Удаляем дубликаты по названию мерчанта
-    df = df.drop_duplicates(subset=[merchant_col])
-    
-    # Берем первые две числовые колонки для значений
-    numeric_cols = []
-    
-    # Пытаемся найти числовые колонки
+    return merchant_col, id_col
+
+def schema_key(source_type, columns):
+    """Ключ реестра колонок: тип файла и заголовок"""
+    return f"{source_type}|{json.dumps([str(col) for col in columns], ensure_ascii=False)}"
+
+def find_value_columns(df, merchant_col):
+    """Находит две колонки со значениями (date1, date2)"""
     numeric_cols = []
     
     # Сначала ищем колонки, которые выглядят как даты или значения
@@ -225,6 +212,86 @@ def normalize_df(df, source_type, excluded_merchant_ids=None, keep_zero_rows=Fal
             print(f"{i}. {col} (тип: {df[col].dtype}, пример: {str(df[col].iloc[0])[:50]}...")
         raise ValueError("Нужно как минимум 2 колонки с числовыми данными.")
     
+    return numeric_cols
+
+def normalize_df(df, source_type, excluded_merchant_ids=None, keep_zero_rows=False, schema_registry=None):
+    if excluded_merchant_ids is None:
+        excluded_merchant_ids = []
+    """Приводит df к merchant_name, date1, date2
+
+    schema_registry — словарь с уже найденными колонками (мерчант, ID, два
+    значения) по типу файла и заголовку. Если заголовок файла там есть,
+    колонки не ищутся заново; новые результаты поиска туда добавляются.
+    """
+    print(f"\nОбработка файла типа: {source_type}")
+    print("Доступные колонки:", list(df.columns))
+    
+    key = schema_key(source_type, df.columns)
+    schema = (schema_registry or {}).get(key)
+    if schema and all(col in df.columns for col in [schema['merchant_col'], schema['id_col']] + schema['numeric_cols']):
+        merchant_col, id_col = schema['merchant_col'], schema['id_col']
+        print("Колонки взяты из реестра для этого типа файла и заголовка")
+    else:
+        schema = None
+        # Выводим информацию о типах данных в колонках
+        print("\nТипы данных в колонках:")
+        for col in df.columns:
+            print(f"- {col}: {df[col].dtype}, пример: {df[col].iloc[0] if len(df) > 0 else 'нет данных'}")
+        
+        merchant_col, id_col = find_key_columns(df)
+    
+    # Очищаем названия мерчантов и ID
+    df[merchant_col] = df[merchant_col].astype(str).str.strip().str.replace('"', '').str.strip()
+    if id_col != merchant_col:
+        df[id_col] = df[id_col].astype(str).str.strip().str.replace('"', '').str.strip()
+    
+    # Удаляем пустые строки
+    df = df[df[merchant_col] != '']
+    df = df[df[merchant_col].str.lower() != 'nan']
+    
+    # Примечание: не удаляем строки с excluded_merchant_ids здесь —
+    # они будут обрабатываться и отображаться в полном отчёте (process_files соберёт их отдельно).
+    
+    # Объединяем ID и название мерчанта, если это разные колонки
+    # Исключение для определенных мерчантов, где ID не нужен
+    if id_col != merchant_col and id_col in df.columns:
+        merchant_ids = clean_text_values(df[id_col])
+        merchant_names = clean_text_values(df[merchant_col])
+        
+        # Скрываем ID, если в нём встречается любой из HIDE_IDS.
+        # Различных ID мало, поэтому регулярка проверяет каждый из них один раз
+        id_codes, unique_ids = pd.factorize(merchant_ids)
+        hide_id = np.array([is_hidden_id(merchant_id) for merchant_id in unique_ids], dtype=bool)[id_codes]
+        
+        # ID дописывается перед названием, если его там ещё нет
+        with_id = (
+            ~hide_id
+            & (merchant_ids != '')
+            & ~np.char.startswith(merchant_names.astype(str), merchant_ids.astype(str))
+        )
+        labels = np.where(with_id, merchant_ids + ' ' + merchant_names, merchant_names)
+        df[merchant_col] = pd.Series(labels, index=df.index, dtype=object)
+    
+    # Сохраняем оригинальный ID в отдельной колонке, чтобы потом можно было показать скрытые ID в полном отчёте
+    if id_col in df.columns:
+        df['merchant_id'] = df[id_col].astype(str).str.strip()
+    else:
+        df['merchant_id'] = ''
+    
+    # Удаляем дубликаты по названию мерчанта
+    df = df.drop_duplicates(subset=[merchant_col])
+    
+    if schema:
+        numeric_cols = schema['numeric_cols']
+    else:
+        numeric_cols = find_value_columns(df, merchant_col)
+        if schema_registry is not None:
+            schema_registry[key] = {
+                'merchant_col': merchant_col,
+                'id_col': id_col,
+                'numeric_cols': list(numeric_cols),
+            }
+    
     # Преобразуем выбранные колонки в числа
     for col in numeric_cols:
         try:
@@ -301,88 +368,212 @@ def classify_file(filename):
     else:
         return "Прочее"
 
+def clean_text_values(series):
+    """str(value).strip() для всей колонки; каждое различное значение чистится один раз"""
+    codes, uniques = pd.factorize(series)
+    # Код -1 (пустое значение) попадает на последний элемент — str(NaN)
+    cleaned = np.array([str(value).strip() for value in uniques] + ['nan'], dtype=object)
+    return cleaned[codes]
+
+def count_values(series):
+    """int(float(value)) для всей колонки.
+
+    Возвращает массив целых (пустые значения — 0) и маску значений,
+    которые удалось привести к числу.
+    """
+    if pd.api.types.is_integer_dtype(series) and not series.hasnans:
+        return series.to_numpy(dtype='int64'), np.ones(len(series), dtype=bool)
+    if pd.api.types.is_numeric_dtype(series):
+        numbers = series.astype(float)
+    else:
+        numbers = pd.to_numeric(series, errors='coerce')
+    parsed = numbers.notna().to_numpy() | series.isna().to_numpy()
+    values = np.trunc(numbers.fillna(0).to_numpy(dtype=float)).astype('int64')
+    return values, parsed
+
+def sum_by_merchant(names, codes, old_vals, new_vals, ids=None):
+    """Суммы old/new по мерчантам (codes — номера в names) в порядке первого появления"""
+    frame = pd.DataFrame({'old': old_vals, 'new': new_vals})
+    if ids is not None:
+        frame['id'] = ids
+    grouped = frame.groupby(codes, sort=False)
+    totals = grouped[['old', 'new']].sum()
+    result = {
+        names[code]: {'old': int(old), 'new': int(new)}
+        for code, old, new in zip(totals.index, totals['old'], totals['new'])
+    }
+    if ids is not None:
+        # ID берём из первой строки мерчанта
+        for code, merchant_id in grouped['id'].first().items():
+            result[names[code]]['id'] = merchant_id
+    return result
+
+def load_folder_cache(folder_path, cache_file):
+    try:
+        with open(os.path.join(folder_path, cache_file), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_folder_cache(folder_path, cache_file, cache):
+    try:
+        with open(os.path.join(folder_path, cache_file), 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=1)
+    except (OSError, TypeError) as e:
+        print(f"Не удалось сохранить {cache_file}: {e}")
+
+def read_csv_sample(file_path, encoding):
+    """Начало файла, декодированное в encoding, без последней (возможно обрезанной) строки.
+
+    None, если начало файла в этой кодировке не читается.
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read(CSV_SAMPLE_BYTES)
+        truncated = bool(f.read(1))
+    try:
+        text = codecs.getincrementaldecoder(encoding)().decode(raw, final=not truncated)
+    except UnicodeDecodeError:
+        return None
+    if truncated and '\n' in text:
+        text = text.rsplit('\n', 1)[0]
+    return text
+
+def detect_csv_encoding(file_path):
+    """Первая кодировка из CSV_ENCODINGS, в которой читается начало файла, и само начало"""
+    for encoding in CSV_ENCODINGS:
+        text = read_csv_sample(file_path, encoding)
+        if text is not None:
+            return encoding, text
+    return 'latin-1', read_csv_sample(file_path, 'latin-1')
+
+def detect_csv_dialect(file_path):
+    """Определяет по началу файла параметры pd.read_csv: разделитель, кавычки,
+    кодировку, разделители тысяч и дробной части."""
+    encoding, text = detect_csv_encoding(file_path)
+    
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS)
+        sep, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        # Sniffer не справился: берём самый частый разделитель в заголовке
+        header = text.split('\n', 1)[0]
+        sep = max(CSV_DELIMITERS, key=header.count)
+        if not header.count(sep):
+            sep = ','
+        quotechar = '"'
+    
+    # Дробная часть — всегда запятая, как читали раньше, при любом разделителе:
+    # с точкой целые в колонке с дробными стали бы float, и очистка в
+    # normalize_df сделала бы из '3.0' — 30
+    thousands = '\xa0' if re.search(r'\d\xa0\d{3}', text) else ' '
+    
+    return {
+        'sep': sep,
+        'quotechar': quotechar,
+        'encoding': encoding,
+        'thousands': thousands,
+        'decimal': ',',
+    }
+
+def dialect_fits(file_path, dialect):
+    """Подходит ли запомненный формат к файлу: та же кодировка и заголовок делится разделителем.
+
+    Дробная точка — запись старой версии, такой формат определяется заново.
+    """
+    encoding, text = detect_csv_encoding(file_path)
+    sep = dialect.get('sep', ',')
+    if dialect.get('decimal') != ',':
+        return False
+    return encoding == dialect.get('encoding') and sep in text.split('\n', 1)[0]
+
+def read_csv_file(file_path, file_type, dialect_cache):
+    """Читает CSV одним разбором, с форматом из dialect_cache для этого типа файла
+    или определённым по началу файла."""
+    dialect = dialect_cache.get(file_type)
+    if dialect and dialect_fits(file_path, dialect):
+        how = "запомнен для типа"
+    else:
+        dialect = detect_csv_dialect(file_path)
+        how = "определён по началу файла"
+    print(f"Формат CSV ({how} «{file_type}»): разделитель {dialect['sep']!r}, "
+          f"кодировка {dialect['encoding']}, дробная часть {dialect['decimal']!r}")
+    
+    try:
+        df = pd.read_csv(file_path, engine='c', **dialect)
+    except Exception as e:
+        # Крайний случай: автоопределение медленным python-парсером, как раньше
+        print(f"Не удалось прочитать файл в этом формате ({e}), пробуем автоопределение")
+        return pd.read_csv(file_path, sep=None, engine='python', encoding_errors='replace')
+    
+    dialect_cache[file_type] = dialect
+    return df
+
 def process_files(files, excluded_merchant_ids=None):
-    """Обрабатывает все файлы и возвращает список мерчантов с изменениями"""
-    merchant_data = {}
-    excluded_data = {}  # Для отслеживания исключённых аккаунтов
-    empty_id_data = {}  # Для аккаунтов без ID
-    hidden_ids_data = {}  # Для аккаунтов из HIDE_IDS
-    
+    """Обрабатывает все файлы и возвращает список мерчантов с изменениями
+
+    Все строки разбираются разом: для каждой категории (исключённые, без ID,
+    со скрытыми ID, обычные) строится маска, и суммы по мерчантам считаются
+    одним groupby на категорию.
+    """
     if excluded_merchant_ids is None:
         excluded_merchant_ids = []
     
+    merchants = []
+    merchant_ids = []
+    old_vals = []
+    new_vals = []
     for filename, df in files:
         print(f"\nОбработка файла: {filename}")
-        for _, row in df.iterrows():
-            merchant = str(row['merchant_name']).strip()
-            old_val = row.get('date1', 0)
-            new_val = row.get('date2', 0)
-            
-            # Пропускаем пустые или некорректные значения
-            if not merchant or merchant.lower() in ['nan', 'none', '']:
-                continue
-            
-            # Берём ID из отдельной колонки, если она есть (normalize_df добавляет её)
-            merchant_id = str(row.get('merchant_id', '')).strip()
-            # Отслеживаем исключённые аккаунты
-            if merchant_id and merchant_id in excluded_merchant_ids:
-                    if merchant not in excluded_data:
-                        excluded_data[merchant] = {'old': 0, 'new': 0}
-                    try:
-                        old_val = int(float(old_val)) if pd.notna(old_val) else 0
-                        new_val = int(float(new_val)) if pd.notna(new_val) else 0
-                    except (ValueError, TypeError):
-                        old_val = 0
-                        new_val = 0
-                    excluded_data[merchant]['old'] += old_val
-                    excluded_data[merchant]['new'] += new_val
-                    continue
-            
-            # Проверяем аккаунты без ID (нет merchant_id и название не начинается с 'AA')
-            if not merchant_id and not merchant.startswith('AA'):
-                if merchant not in empty_id_data:
-                    empty_id_data[merchant] = {'old': 0, 'new': 0}
-                try:
-                    old_val = int(float(old_val)) if pd.notna(old_val) else 0
-                    new_val = int(float(new_val)) if pd.notna(new_val) else 0
-                except (ValueError, TypeError):
-                    old_val = 0
-                    new_val = 0
-                empty_id_data[merchant]['old'] += old_val
-                empty_id_data[merchant]['new'] += new_val
-                continue
-                
-            # Приводим к целым числам
-            try:
-                old_val = int(float(old_val)) if pd.notna(old_val) else 0
-                new_val = int(float(new_val)) if pd.notna(new_val) else 0
-            except (ValueError, TypeError):
-                old_val = 0
-                new_val = 0
-            
-            # Раньше мы пропускали записи, где оба значения нулевые.
-            # Теперь сохраняем их для полной аналитики (фильтрация в основном отчете останется).
-            # if old_val == 0 and new_val == 0:
-            #     continue
-
-            # Собираем отдельно аккаунты, для которых скрываем ID (HIDE_IDS)
-            if merchant_id and merchant_id in HIDE_IDS:
-                if merchant not in hidden_ids_data:
-                    hidden_ids_data[merchant] = {'old': 0, 'new': 0, 'id': merchant_id}
-                try:
-                    old_val = int(float(old_val)) if pd.notna(old_val) else 0
-                    new_val = int(float(new_val)) if pd.notna(new_val) else 0
-                except (ValueError, TypeError):
-                    old_val = 0
-                    new_val = 0
-                hidden_ids_data[merchant]['old'] += old_val
-                hidden_ids_data[merchant]['new'] += new_val
-                
-            if merchant not in merchant_data:
-                merchant_data[merchant] = {'old': 0, 'new': 0}
-                
-            merchant_data[merchant]['old'] += old_val
-            merchant_data[merchant]['new'] += new_val
+        merchants.append(clean_text_values(df['merchant_name']))
+        # Берём ID из отдельной колонки, если она есть (normalize_df добавляет её)
+        if 'merchant_id' in df.columns:
+            merchant_ids.append(clean_text_values(df['merchant_id']))
+        else:
+            merchant_ids.append(np.full(len(df), '', dtype=object))
+        no_values = (np.zeros(len(df), dtype='int64'), np.ones(len(df), dtype=bool))
+        old, old_ok = count_values(df['date1']) if 'date1' in df.columns else no_values
+        new, new_ok = count_values(df['date2']) if 'date2' in df.columns else no_values
+        # Если хотя бы одно значение строки не число, обе суммы строки — 0
+        broken = ~(old_ok & new_ok)
+        old_vals.append(np.where(broken, 0, old))
+        new_vals.append(np.where(broken, 0, new))
+    
+    if not merchants:
+        return {}, {}, {}, {}
+    
+    old_val = np.concatenate(old_vals)
+    new_val = np.concatenate(new_vals)
+    
+    # Признаки считаем по различным названиям и ID, а на строки раскладываем по кодам
+    merchant_codes, names = pd.factorize(np.concatenate(merchants))
+    id_codes, ids = pd.factorize(np.concatenate(merchant_ids))
+    names_s = pd.Series(names, dtype=object)
+    ids_s = pd.Series(ids, dtype=object)
+    
+    # Пропускаем пустые или некорректные значения
+    valid = ~names_s.str.lower().isin(['nan', 'none', '']).to_numpy()[merchant_codes]
+    starts_aa = names_s.str.startswith('AA').to_numpy(dtype=bool)[merchant_codes]
+    has_id = (ids_s != '').to_numpy()[id_codes]
+    
+    # Исключённые аккаунты
+    excluded = valid & has_id & ids_s.isin(set(excluded_merchant_ids)).to_numpy()[id_codes]
+    # Аккаунты без ID (нет merchant_id и название не начинается с 'AA')
+    empty_id = valid & ~excluded & ~has_id & ~starts_aa
+    # Все остальные попадают в основной отчёт, в том числе строки с 0→0
+    regular = valid & ~excluded & ~empty_id
+    # Аккаунты, для которых скрываем ID (HIDE_IDS), собираем ещё и отдельно
+    hidden = regular & ids_s.isin(set(HIDE_IDS)).to_numpy()[id_codes]
+    
+    def bucket(mask, with_ids=False):
+        return sum_by_merchant(
+            names, merchant_codes[mask], old_val[mask], new_val[mask],
+            ids=ids[id_codes[mask]] if with_ids else None
+        )
+    
+    merchant_data = bucket(regular)
+    excluded_data = bucket(excluded)
+    empty_id_data = bucket(empty_id)
+    hidden_ids_data = bucket(hidden, with_ids=True)
     
     return merchant_data, excluded_data, empty_id_data, hidden_ids_data
 
@@ -593,58 +784,29 @@ def print_full_analytics(merchant_data, special_merchant_data, excluded_data, em
     
     print("\n" + "="*80 + "\n")
 
-def main(folder_path):
-    # Список ID мерчантов, которые нужно исключить из отчета
-    EXCLUDED_MERCHANT_IDS = [
-        "3245", "3240", "3243", "3244", "3239", "3247", "3232",
-        "3028", "3234", "3235", "3236", "3233", "3021", "3246"
-    ]
-    
-    # Получаем данные для специальных аккаунтов от пользователя
-    special_merchant_data = get_special_merchant_data()
-    
-    print(f"Обработка файлов в директории: {folder_path}")
-    print("-" * 50)
-    
-    all_files = []
-    
-    # Собираем все CSV файлы
-    file_count = 0
-    for filename in os.listdir(folder_path):
-        if not filename.endswith(".csv"):
-            continue
-            
-        file_count += 1
+def load_and_normalize(filename, folder_path, dialect_cache, schema_registry, excluded_merchant_ids,
+                       capture_output=False):
+    """Читает и нормализует один CSV.
+
+    При capture_output весь вывод по файлу собирается в лог (для пула процессов),
+    иначе сразу печатается. Возвращает нормализованную таблицу (None при ошибке),
+    текст лога и то, что нужно добавить в кэш форматов и реестр колонок.
+    """
+    file_type = classify_file(filename)
+    dialects = dict(dialect_cache)
+    schemas = dict(schema_registry)
+    normalized_df = None
+    rows = None
+    error = None
+    log = io.StringIO()
+    with contextlib.ExitStack() as output:
+        if capture_output:
+            output.enter_context(contextlib.redirect_stdout(log))
+            output.enter_context(contextlib.redirect_stderr(log))
         try:
-            # Пробуем разные варианты чтения файла
-            try:
-                # Вариант 1: CSV с запятыми, кавычками и русскими символами
-                df = pd.read_csv(
-                    os.path.join(folder_path, filename),
-                    sep=',',
-                    quotechar='"',
-                    encoding='utf-8',
-                    thousands=' ',
-                    decimal=','
-                )
-            except Exception as e1:
-                try:
-                    # Вариант 2: CSV с точкой с запятой
-                    df = pd.read_csv(
-                        os.path.join(folder_path, filename),
-                        sep=';',
-                        quotechar='"',
-                        encoding='utf-8',
-                        thousands=' ',
-                        decimal=','
-                    )
-                except Exception as e2:
-                    # Вариант 3: Автоопределение параметров
-                    df = pd.read_csv(
-                        os.path.join(folder_path, filename),
-                        engine='python',
-                        encoding_errors='replace'
-                    )
+            with stage('read_csv') as st:
+                df = read_csv_file(os.path.join(folder_path, filename), file_type, dialects)
+                st.rows = rows = len(df)
             
             # Выводим информацию о загруженных данных
             print(f"\nФайл: {filename}")
@@ -652,30 +814,98 @@ def main(folder_path):
             print(df.head(3).to_string())
             print("\nКолонки:", df.columns.tolist())
             
-            file_type = classify_file(filename)
             # Сохраняем также строки с 0→0 для последующей полной аналитики
-            normalized_df = normalize_df(df, file_type, EXCLUDED_MERCHANT_IDS, keep_zero_rows=True)
-            all_files.append((filename, normalized_df))
+            with stage('normalize_df') as st:
+                st.rows = len(df)
+                normalized_df = normalize_df(
+                    df, file_type, excluded_merchant_ids, keep_zero_rows=True, schema_registry=schemas
+                )
             print(f"Успешно обработан файл: {filename} ({file_type})")
             
         except Exception as e:
+            error = str(e)
             print(f"Ошибка при обработке файла {filename}: {str(e)}")
-            import traceback
             traceback.print_exc()
     
+    return {
+        'file_type': file_type,
+        'df': normalized_df,
+        'rows': rows,
+        'error': error,
+        'log': log.getvalue(),
+        'dialect': dialects.get(file_type),
+        'schemas': {key: value for key, value in schemas.items() if key not in schema_registry},
+    }
+
+def main(folder_path, workers=1):
+    # Список ID мерчантов, которые нужно исключить из отчета
+    EXCLUDED_MERCHANT_IDS = [
+        "3245", "3240", "3243", "3244", "3239", "3247", "3232",
+        "3028", "3234", "3235", "3236", "3233", "3021", "3246"
+    ]
+    
+    # Получаем данные для специальных аккаунтов от пользователя
+    special_merchant_data = get_special_merchant_data()
+    
+    print(f"Обработка файлов в директории: {folder_path}")
+    print("-" * 50)
+    
+    all_files = []
+    dialect_cache = load_folder_cache(folder_path, DIALECT_CACHE_FILE)
+    schema_registry = load_folder_cache(folder_path, SCHEMA_CACHE_FILE)
+    
+    # Собираем все CSV файлы; порядок имён задаёт порядок слияния
+    filenames = sorted(filename for filename in os.listdir(folder_path) if filename.endswith(".csv"))
+    file_count = len(filenames)
+    
+    # Файлы читаются и нормализуются независимо, при workers > 1 — параллельно
+    with stage('read_normalize'):
+        results = transaction_reports.map_files(
+            load_and_normalize, filenames, workers,
+            folder_path=folder_path, dialect_cache=dialect_cache,
+            schema_registry=schema_registry, excluded_merchant_ids=EXCLUDED_MERCHANT_IDS,
+            capture_output=workers > 1
+        )
+    
+    log_dir = os.path.join(folder_path, LOG_DIR)
+    for filename, result in zip(filenames, results):
+        if workers > 1:
+            # Подробности — в лог файла, на экран только итог
+            os.makedirs(log_dir, exist_ok=True)
+            log_path = os.path.join(log_dir, f"{filename}.log")
+            with open(log_path, 'w', encoding='utf-8') as f:
+                f.write(result['log'])
+            status = "обработан" if result['df'] is not None else "ошибка"
+            print(f"{filename} ({result['file_type']}): {status}, лог: {log_path}")
+        
+        # Отброшенные — строки, которые нормализация не оставила
+        rejected = result['rows'] - len(result['df']) if result['df'] is not None else None
+        run_metrics.file_rows(filename, result['rows'], rejected, error=result['error'])
+        
+        if result['df'] is not None:
+            all_files.append((filename, result['df']))
+        if result['dialect'] is not None:
+            dialect_cache[result['file_type']] = result['dialect']
+        schema_registry.update(result['schemas'])
+    
     if file_count == 0:
         print("Не найдено CSV файлов для обработки.")
         return
+    save_folder_cache(folder_path, DIALECT_CACHE_FILE, dialect_cache)
+    save_folder_cache(folder_path, SCHEMA_CACHE_FILE, schema_registry)
     
     # Обрабатываем все файлы вместе
-    merchant_data, excluded_data, empty_id_data, hidden_ids_data = process_files(all_files, EXCLUDED_MERCHANT_IDS)
+    with stage('compare') as st:
+        st.rows = sum(len(df) for _, df in all_files)
+        merchant_data, excluded_data, empty_id_data, hidden_ids_data = process_files(all_files, EXCLUDED_MERCHANT_IDS)
     
     if not (merchant_data or excluded_data or empty_id_data or hidden_ids_data or special_merchant_data):
         print("\nНе найдено данных для отображения. Проверьте входные файлы.")
         return
     
     # Выводим полную аналитику для анализа
-    print_full_analytics(merchant_data, special_merchant_data, excluded_data, empty_id_data, hidden_ids_data)
+    with stage('analytics'):
+        print_full_analytics(merchant_data, special_merchant_data, excluded_data, empty_id_data, hidden_ids_data)
     
     # Разделяем на категории
     increasing = []
@@ -805,7 +1035,25 @@ def main(folder_path):
     
     # Убираем секцию 'Без изменений'
 
-if __name__ == "__main__":
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Сравнение мерчантов по CSV-выгрузкам в текущей папке')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Сколько файлов читать и нормализовать параллельно (по умолчанию 1)')
+    stage_profile.add_arguments(parser)
+    run_metrics.add_arguments(parser)
+    return parser.parse_args()
+
+def cli():
+    """Запуск из командной строки: аргументы, профиль и метрики вокруг main"""
+    args = parse_arguments()
+    stage_profile.start_from_args(args)
+    run_metrics.start_from_args(args, 'rep0000')
     # Запускаем с текущей директорией
-    main(os.getcwd())
+    main(os.getcwd(), args.workers)
+    # Таблица профиля и метрики — до вопроса, а не после закрытия окна
+    stage_profile.report()
+    run_metrics.write()
+
+if __name__ == "__main__":
+    cli()
     input("\nЖамкай Enter что бы выйти...")
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Единая точка входа для всех отчётов
+
+Каждая команда запускает соответствующий скрипт с его же параметрами:
+  stats             calc_stats.py       success rate и оборот
+  status-report     angelina_report.py  количество и сумма по статусам
+  before-noon       12oo.py             транзакции до 12:00 по Москве
+  orec              calc_new.py         итог по OREC-файлу
+  mosteh            mosteh.py           отчёт МосТех за период
+  merchant-compare  rep0000.py          сравнение мерчантов по CSV
+  morning           morning_report.py   stats, status-report и before-noon за одно чтение
+
+pandas, openpyxl и модули отчётов загружаются только тогда, когда команде
+они нужны, так что --help или запуск в папке без выгрузок отвечает сразу.
+Свой разбор через argparse reports.py делает только для --help и ошибок в
+имени команды: обычная команда сразу передаётся своему скрипту.
+Несколько команд, разделённых «+», выполняются в одном процессе, и
+библиотеки загружаются один раз.
+
+=== КАК ЗАПУСТИТЬ ===
+
+1. Меню (как run_scripts_*):
+   python reports.py
+
+2. Одна команда:
+   python reports.py stats --workers 4
+   python reports.py mosteh --start_date 2026-01-19 --end_date 2026-01-19
+
+3. Несколько команд подряд:
+   python reports.py stats + status-report + before-noon
+
+4. Параметры команды:
+   python reports.py mosteh --help
+"""
+
+import importlib
+import sys
+
+# Команда: (модуль, функция запуска, описание)
+COMMANDS = {
+    'stats': ('calc_stats', 'main', 'Success rate и оборот по Transaction-*.xlsx (calc_stats.py)'),
+    'status-report': ('angelina_report', 'main', 'Количество и сумма по статусам (angelina_report.py)'),
+    'before-noon': ('12oo', 'main', 'Транзакции до 12:00 по Москве по мерчантам (12oo.py)'),
+    'orec': ('calc_new', 'main', 'Итог по OREC-файлу (calc_new.py)'),
+    'mosteh': ('mosteh', 'main', 'Отчёт МосТех за период (mosteh.py)'),
+    'merchant-compare': ('rep0000', 'cli', 'Сравнение мерчантов по CSV-выгрузкам (rep0000.py)'),
+    'morning': ('morning_report', 'main', 'stats, status-report и before-noon за одно чтение (morning_report.py)'),
+}
+
+SEPARATOR = '+'
+
+# Пункты меню в том же порядке, что были в run_scripts_*
+MENU = [
+    ('1', 'status-report', 'Standard report generation'),
+    ('2', 'stats', 'Quick statistics calculation from Transaction-*.xlsx files'),
+    ('3', 'before-noon', 'Transactions before 12:00 Moscow time per merchant'),
+    ('4', 'mosteh', 'Report generation for a specific date range'),
+    ('5', 'merchant-compare', 'Interactive analysis with manual input for 5 merchant accounts'),
+    ('6', 'morning', 'Reports 1-3 in one pass over Transaction-*.xlsx files'),
+    ('7', 'orec', 'Totals for the OREC CSV file'),
+]
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='reports.py',
+        description='Все отчёты через одну команду. Несколько команд разделяются «+».',
+        epilog='Команды:\n' + '\n'.join(f'  {name:<18}{description}' for name, (_, _, description) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('command', choices=list(COMMANDS), metavar='COMMAND',
+                        help='Что запустить (список ниже)')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='Параметры скрипта команды (см. python reports.py COMMAND --help)')
+    return parser
+
+
+def split_commands(argv):
+    """['stats', '--workers', '2', '+', 'orec'] → [['stats', '--workers', '2'], ['orec']]"""
+    chunks = [[]]
+    for arg in argv:
+        if arg == SEPARATOR:
+            chunks.append([])
+        else:
+            chunks[-1].append(arg)
+    return [chunk for chunk in chunks if chunk]
+
+
+def parse_command(chunk):
+    """['stats', '--workers', '2'] → ('stats', ['--workers', '2'])"""
+    if chunk[0] in COMMANDS:
+        return chunk[0], chunk[1:]
+    # --help или опечатка: справку или ошибку печатает argparse
+    parsed = build_parser().parse_args(chunk)
+    return parsed.command, parsed.args
+
+
+def finish_command():
+    """Профиль и метрики относятся к своей команде, следующая начинает заново"""
+    for name, finish in (('stage_profile', 'report'), ('run_metrics', 'write')):
+        module = sys.modules.get(name)
+        if module is not None:
+            getattr(module, finish)()
+
+
+def run_command(command, args):
+    """Запускает команду, как если бы её скрипт вызвали с args; возвращает код выхода"""
+    module_name, function_name, _ = COMMANDS[command]
+    saved_argv = sys.argv
+    # argparse скрипта возьмёт отсюда и параметры, и имя для usage
+    sys.argv = [f'reports.py {command}'] + list(args)
+    try:
+        getattr(importlib.import_module(module_name), function_name)()
+        return 0
+    except SystemExit as e:
+        # Скрипты завершаются через exit(): здесь это конец команды, а не всего запуска
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code)
+        return 1
+    finally:
+        sys.argv = saved_argv
+        finish_command()
+
+
+def menu():
+    print("=" * 80)
+    print("SCRIPTS LAUNCHER".center(80))
+    print("=" * 80 + "\n")
+    for key, command, description in MENU:
+        print(f"{key} - {command}")
+        print(f"   {description}\n")
+    print("=" * 80 + "\n")
+
+    choice = input(f"Enter choice 1-{len(MENU)}: ").strip()
+    commands = {key: command for key, command, _ in MENU}
+    if choice not in commands:
+        print(f"Invalid choice: {choice}")
+        return 1
+
+    command = commands[choice]
+    args = []
+    if command == 'mosteh':
+        start = input("Enter start date (YYYY-MM-DD): ").strip()
+        end = input("Enter end date (YYYY-MM-DD): ").strip()
+        if not start or not end:
+            print("Error: Both dates are required!")
+            return 1
+        args = ['--start_date', start, '--end_date', end]
+
+    print(f"Running {command} ...")
+    return run_command(command, args)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.exit(menu())
+
+    chunks = split_commands(argv)
+    if not chunks:
+        build_parser().error('не указана команда')
+    # Все команды разбираются до запуска первой, чтобы опечатка не всплыла на середине
+    commands = [parse_command(chunk) for chunk in chunks]
+
+    exit_code = 0
+    for command, args in commands:
+        if len(commands) > 1:
+            print("\n" + "#" * 60 + f"\n# {command}\n" + "#" * 60)
+        exit_code = run_command(command, args) or exit_code
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Machine-readable metrics of a report run (--metrics_json / --metrics_prom).
+
+A script calls start() with its name; after that the shared readers note how
+long every file took to parse (map_files times each call, in worker
+processes too) and the script adds what it knows about the file: rows read,
+rows rejected (e.g. 12oo's "Time errors"), errors. At exit one record is
+written:
+
+  --metrics_json FILE  one JSON line appended per run, so the file keeps history
+  --metrics_prom FILE  Prometheus textfile-collector format, replaced atomically
+
+Both default to the REPORT_METRICS_JSON / REPORT_METRICS_PROM environment
+variables, so scheduled runs can be set up without changing the command.
+The prom file is replaced as a whole, so every script needs its own: a
+"{script}" placeholder in the path is filled in, a directory gets
+<script>.prom, and a plain file named by REPORT_METRICS_PROM (shared by all
+scripts) gets the script name before its extension.
+Files whose partials came from the export manifest are marked cached and
+have no parse time.
+"""
+
+import atexit
+import os
+import time
+
+from lazy_imports import lazy_import
+
+# Needed only when metrics are on
+dt = lazy_import('datetime')
+json = lazy_import('json')
+
+PROM_PREFIX = 'report'
+
+# State of the current run; None while metrics are off
+_run = None
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics_json', metavar='FILE', default=os.environ.get('REPORT_METRICS_JSON'),
+                        help='Append a JSON metrics record of the run to FILE')
+    parser.add_argument('--metrics_prom', metavar='FILE', default=None,
+                        help='Write the run metrics to FILE in Prometheus textfile format '
+                             '("{script}" in FILE is replaced with the script name; a directory gets <script>.prom)')
+
+
+def prom_path(value, script, shared=False):
+    """Prometheus file of this script for a --metrics_prom / REPORT_METRICS_PROM value.
+
+    shared marks a value every script gets (the environment variable): a plain
+    file name is then made per script, or the scripts would replace each
+    other's series.
+    """
+    if '{script}' in value:
+        return value.replace('{script}', script)
+    if os.path.isdir(value) or value.endswith(('/', os.sep)):
+        return os.path.join(value, f'{script}.prom')
+    if shared:
+        stem, ext = os.path.splitext(value)
+        return f'{stem}_{script}{ext or ".prom"}'
+    return value
+
+
+def start_from_args(args, script):
+    prom_file = None
+    if args.metrics_prom:
+        prom_file = prom_path(args.metrics_prom, script)
+    elif os.environ.get('REPORT_METRICS_PROM'):
+        prom_file = prom_path(os.environ['REPORT_METRICS_PROM'], script, shared=True)
+    if args.metrics_json or prom_file:
+        start(script, args.metrics_json, prom_file)
+
+
+def start(script, json_file=None, prom_file=None):
+    """Starts collecting metrics for script; the record is written at exit."""
+    global _run
+    if _run is not None:
+        return
+    _run = {
+        'script': script,
+        'started': time.perf_counter(),
+        'started_at': dt.datetime.now(dt.timezone.utc),
+        'files': {},
+        'json_file': json_file,
+        'prom_file': prom_file,
+    }
+    atexit.register(write)
+
+
+def _file_entry(file):
+    entry = _run['files'].get(file)
+    if entry is None:
+        try:
+            size = os.path.getsize(file)
+        except OSError:
+            size = None
+        entry = {'file': file, 'bytes': size, 'rows': None, 'rejected': None,
+                 'parse_seconds': None, 'cached': False}
+        _run['files'][file] = entry
+    return entry
+
+
+def file_parsed(file, seconds, cached=False):
+    """How long file took to parse; cached files were not parsed at all."""
+    if _run is None:
+        return
+    entry = _file_entry(file)
+    entry['parse_seconds'] = None if cached else seconds
+    entry['cached'] = cached
+
+
+def file_rows(file, rows=None, rejected=None, error=None):
+    """Rows read from file, rows rejected while reading it and the error, if any."""
+    if _run is None:
+        return
+    entry = _file_entry(file)
+    if rows is not None:
+        entry['rows'] = int(rows)
+    if rejected is not None:
+        entry['rejected'] = int(rejected)
+    if error is not None:
+        entry['error'] = str(error)
+
+
+def _sum(values):
+    values = [v for v in values if v is not None]
+    return sum(values) if values else None
+
+
+def build_record(run):
+    files = list(run['files'].values())
+    return {
+        'script': run['script'],
+        'started_at': run['started_at'].isoformat(timespec='seconds'),
+        'wall_seconds': round(time.perf_counter() - run['started'], 6),
+        'files_processed': len(files),
+        'files_failed': sum('error' in f for f in files),
+        'rows_read': _sum(f['rows'] for f in files),
+        'rows_rejected': _sum(f['rejected'] for f in files),
+        'bytes_read': _sum(f['bytes'] for f in files if not f['cached']),
+        'bytes_total': _sum(f['bytes'] for f in files),
+        'files': files,
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(record):
+    """The record in Prometheus text exposition format"""
+    script = _label(record['script'])
+    lines = []
+
+    def metric(name, help_text, samples):
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        lines.append(f"# HELP {PROM_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROM_PREFIX}_{name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            lines.append(f"{PROM_PREFIX}_{name}{{{label_text}}} {value}")
+
+    run_labels = [('script', script)]
+    metric('run_wall_seconds', 'Wall time of the last run.', [(run_labels, record['wall_seconds'])])
+    metric('run_files_processed', 'Files processed by the last run.', [(run_labels, record['files_processed'])])
+    metric('run_files_failed', 'Files that could not be processed.', [(run_labels, record['files_failed'])])
+    metric('run_rows_read', 'Rows read by the last run.', [(run_labels, record['rows_read'])])
+    metric('run_rows_rejected', 'Rows rejected by the last run.', [(run_labels, record['rows_rejected'])])
+    metric('run_bytes_read', 'Bytes of the files parsed by the last run.', [(run_labels, record['bytes_read'])])
+    metric('run_bytes_total', 'Size of all files of the last run.', [(run_labels, record['bytes_total'])])
+    started = dt.datetime.fromisoformat(record['started_at']).timestamp()
+    metric('run_started_timestamp_seconds', 'Start of the last run.', [(run_labels, int(started))])
+
+    def per_file(key):
+        return [(run_labels + [('file', _label(os.path.basename(f['file'])))], f[key]) for f in record['files']]
+
+    metric('file_parse_seconds', 'Parse time per file (absent for cached files).', per_file('parse_seconds'))
+    metric('file_rows', 'Rows read per file.', per_file('rows'))
+    metric('file_rows_rejected', 'Rows rejected per file.', per_file('rejected'))
+    metric('file_bytes', 'Size per file.', per_file('bytes'))
+    return '\n'.join(lines) + '\n'
+
+
+def write():
+    """Writes the record (once); called at exit, or earlier by scripts that wait for input."""
+    global _run
+    if _run is None:
+        return
+    run, _run = _run, None
+    record = build_record(run)
+    try:
+        if run['json_file']:
+            with open(run['json_file'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if run['prom_file']:
+            # The textfile collector must never see a half-written file
+            tmp_path = f"{run['prom_file']}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(prometheus_text(record))
+            os.replace(tmp_path, run['prom_file'])
+    except OSError as e:
+        print(f"⚠️ Metrics write failed: {e}")
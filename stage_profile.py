@@ -0,0 +1,175 @@
+"""
+Per-stage profiling for the report scripts (--profile).
+
+Scripts and the shared modules mark their stages with
+
+    with stage('read_excel') as st:
+        df = ...
+        st.rows = len(df)
+
+When profiling is off, stage() returns one shared no-op context manager, so
+the marks cost a function call and nothing else. With --profile every stage
+records wall time, calls, rows and its tracemalloc peak (memory allocated on
+top of what was already held when the stage started); stages opened inside
+other stages are shown nested. tracemalloc slows allocation-heavy code down
+several times, so --profile time records the timings only.
+
+At exit a compact table is printed, and with --profile_stats FILE the whole
+run is also recorded with cProfile and saved for pstats / snakeviz.
+
+Stages that run in worker processes (--workers N > 1) are not recorded: only
+the enclosing stage in the main process is.
+"""
+
+import atexit
+import contextlib
+import time
+from types import SimpleNamespace
+
+from lazy_imports import lazy_import
+
+# Needed only with --profile
+cProfile = lazy_import('cProfile')
+tracemalloc = lazy_import('tracemalloc')
+
+
+class _NoStage:
+    """What stage() yields when profiling is off; setting rows on it is harmless."""
+    rows = None
+
+
+_NO_STAGE = contextlib.nullcontext(_NoStage())
+
+# State of the current run; None while profiling is off
+_profile = None
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='memory', choices=['memory', 'time'],
+                        help='Print time, rows/sec and peak memory per stage at the end '
+                             '(--profile time: timings only, without the tracemalloc slowdown)')
+    parser.add_argument('--profile_stats', metavar='FILE',
+                        help='Also save a cProfile dump of the run to FILE (implies --profile)')
+
+
+def start_from_args(args):
+    if args.profile or args.profile_stats:
+        start(args.profile_stats, memory=args.profile != 'time')
+
+
+def start(stats_file=None, memory=True):
+    """Turns profiling on for the rest of the process; the table is printed at exit."""
+    global _profile
+    if _profile is not None:
+        return
+    if memory:
+        tracemalloc.start()
+    profiler = None
+    if stats_file:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _profile = {
+        'started': time.perf_counter(),
+        'stages': {},
+        'stack': [],
+        'peak': 0,
+        'memory': memory,
+        'cprofile': profiler,
+        'stats_file': stats_file,
+    }
+    atexit.register(report)
+
+
+def stage(name):
+    """Context manager timing the stage name; yields an object whose rows may be set."""
+    if _profile is None:
+        return _NO_STAGE
+    return _timed_stage(name)
+
+
+def _note_peak(peak):
+    # tracemalloc keeps a single peak, which is reset for every stage, so the
+    # peaks seen so far are carried up to the enclosing stage and the whole run
+    stack = _profile['stack']
+    if stack:
+        stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+    _profile['peak'] = max(_profile['peak'], peak)
+
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    stack = _profile['stack']
+    memory = _profile['memory']
+    current = 0
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        _note_peak(peak)
+        tracemalloc.reset_peak()
+
+    key = '/'.join([frame['name'] for frame in stack] + [name])
+    # Registered on entry, so the table lists stages in the order they start
+    totals = _profile['stages'].setdefault(key, {'calls': 0, 'seconds': 0.0, 'peak': 0, 'rows': None})
+    frame = {'name': name, 'peak': 0}
+    stack.append(frame)
+    record = SimpleNamespace(rows=None)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - started
+        stack.pop()
+        peak = frame['peak']
+        if memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            _note_peak(peak)
+
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        totals['peak'] = max(totals['peak'], peak - current)
+        if record.rows is not None:
+            totals['rows'] = (totals['rows'] or 0) + record.rows
+
+
+def totals():
+    """Stage totals recorded so far, {'outer/inner': {'calls', 'seconds', 'rows'}}; {} while profiling is off."""
+    if _profile is None:
+        return {}
+    return {key: {'calls': t['calls'], 'seconds': t['seconds'], 'rows': t['rows']}
+            for key, t in _profile['stages'].items()}
+
+
+def _mib(size, memory):
+    return f"{size / (1024 * 1024):10.1f}" if memory else f"{'—':>10}"
+
+
+def report():
+    """Prints the stage table (once) and saves the cProfile dump if one was asked for."""
+    global _profile
+    if _profile is None:
+        return
+    profile, _profile = _profile, None
+    total = time.perf_counter() - profile['started']
+    memory = profile['memory']
+    peak = 0
+    if memory:
+        peak = max(profile['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    if profile['cprofile'] is not None:
+        profile['cprofile'].disable()
+        profile['cprofile'].dump_stats(profile['stats_file'])
+
+    print("\n" + "=" * 70)
+    print("⏱️ PROFILE" + (" (tracemalloc on: times include its overhead)" if memory else ""))
+    print(f"{'stage':<32}{'calls':>6}{'seconds':>10}{'peak MiB':>10}{'rows/s':>12}")
+    print("-" * 70)
+    for key, totals in profile['stages'].items():
+        depth = key.count('/')
+        name = "  " * depth + key.rsplit('/', 1)[-1]
+        rate = f"{totals['rows'] / totals['seconds']:>12,.0f}" if totals['rows'] and totals['seconds'] > 0 else f"{'—':>12}"
+        print(f"{name:<32}{totals['calls']:>6}{totals['seconds']:>10.2f}{_mib(totals['peak'], memory)}{rate}")
+    print("-" * 70)
+    print(f"{'total':<32}{'':>6}{total:>10.2f}{_mib(peak, memory)}{'':>12}")
+    print("=" * 70)
+    if profile['stats_file']:
+        print(f"💾 cProfile stats saved to {profile['stats_file']} (python -m pstats {profile['stats_file']})")
@@ -0,0 +1,56 @@
+"""
+rep0000.py: дробная часть при определении формата CSV
+
+Запуск: python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rep0000
+
+
+def write_csv(folder, name, text):
+    path = folder / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_semicolon_file_with_mixed_int_and_dot_decimal_keeps_comma_decimal(tmp_path):
+    # Целые вперемешку с числами через точку: читаем как раньше, с decimal=','
+    path = write_csv(tmp_path, 'payouts_19_00_00.csv',
+                     'merchant_id;merchant_name;Дата 1;Дата 2\n'
+                     '3021;Магазин 0;5;12.5\n'
+                     '3022;Магазин 1;7;3\n')
+    assert rep0000.detect_csv_dialect(path)['decimal'] == ','
+
+    result = rep0000.load_and_normalize('payouts_19_00_00.csv', str(tmp_path), {}, {}, [])
+    assert result['error'] is None
+    df = result['df'].set_index('merchant_id')
+    # Целое 3 не превращается в 3.0 → '30'
+    assert df.loc['3022', 'date2'] == 3
+    assert df.loc['3021', 'date1'] == 5
+    assert df.loc['3022', 'date1'] == 7
+
+
+def test_comma_separated_file_with_mixed_int_and_dot_decimal_keeps_baseline_totals(tmp_path):
+    # Как и для ';', дробная часть — запятая: 3 остаётся 3, а не 3.0 → '30'
+    write_csv(tmp_path, 'payouts_19_00_00.csv',
+              'merchant_id,merchant_name,Дата 1,Дата 2\n'
+              '3021,Магазин 0,5,12.5\n'
+              '3022,Магазин 1,7,3\n')
+    df = rep0000.read_csv_file(str(tmp_path / 'payouts_19_00_00.csv'), 'payouts', {})
+    df = rep0000.normalize_df(df, 'payouts').set_index('merchant_id')
+    assert df.loc['3022', 'date2'] == 3
+    assert df.loc['3021', 'date1'] == 5
+    assert df.loc['3022', 'date1'] == 7
+
+
+def test_cached_dot_decimal_for_semicolon_file_is_detected_again(tmp_path):
+    path = write_csv(tmp_path, 'payouts_19_00_00.csv',
+                     'merchant_id;merchant_name;Дата 1;Дата 2\n'
+                     '3021;Магазин 0;5;12.5\n')
+    stale = dict(rep0000.detect_csv_dialect(path), decimal='.')
+    assert not rep0000.dialect_fits(path, stale)
@@ -0,0 +1,158 @@
+"""
+transaction_cache.py и map_files_incremental: попадания, промахи, вытеснение, манифест
+
+Вместо xlsx — обычные файлы: кэшу важны только размер, mtime и содержимое.
+
+Запуск: python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import transaction_cache
+import transaction_reports
+
+ENTRY_BYTES = 10_000
+
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch):
+    # Тесты проверяют сам кэш, даже если он выключен через TRANSACTION_CACHE=0
+    monkeypatch.setattr(transaction_cache, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(transaction_reports, 'CACHE_ENABLED', True)
+
+
+def write_export(folder, name, content):
+    path = folder / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def counting_build(calls, path):
+    def build():
+        calls.append(path)
+        # Запись примерно ENTRY_BYTES байт, чтобы считать размер кэша
+        return {'path': path, 'payload': b'x' * ENTRY_BYTES}
+    return build
+
+
+def load(path, cache_dir, calls, max_bytes=None):
+    return transaction_cache.load_cached(path, {'test': 1}, counting_build(calls, path), cache_dir, max_bytes)
+
+
+def entry_of(cache_dir, path):
+    with open(cache_dir / transaction_cache.INDEX_FILE, encoding='utf-8') as f:
+        sources = json.load(f)['sources']
+    (entry,) = [src['entry'] for key, src in sources.items() if key.startswith(os.path.abspath(path) + '|')]
+    return cache_dir / entry
+
+
+def test_unchanged_export_is_a_cache_hit(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    path = write_export(tmp_path, 'Transaction-1.xlsx', b'export one')
+    calls = []
+    assert load(path, cache_dir, calls)['path'] == path
+    assert load(path, cache_dir, calls)['path'] == path
+    assert calls == [path]
+
+
+def test_new_mtime_with_same_content_is_still_a_hit(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    path = write_export(tmp_path, 'Transaction-1.xlsx', b'export one')
+    calls = []
+    load(path, cache_dir, calls)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    load(path, cache_dir, calls)
+    assert calls == [path]
+
+
+def test_changed_size_or_content_is_a_miss(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    path = write_export(tmp_path, 'Transaction-1.xlsx', b'export one')
+    calls = []
+    load(path, cache_dir, calls)
+
+    # Другой размер
+    write_export(tmp_path, 'Transaction-1.xlsx', b'export one, longer')
+    load(path, cache_dir, calls)
+    assert len(calls) == 2
+
+    # Тот же размер, другое содержимое (sha256) и mtime
+    st = os.stat(path)
+    write_export(tmp_path, 'Transaction-1.xlsx', b'export two, longer')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    load(path, cache_dir, calls)
+    assert len(calls) == 3
+    assert load(path, cache_dir, calls)['path'] == path
+    assert len(calls) == 3
+
+
+def test_least_recently_used_entry_is_evicted_above_the_limit(tmp_path, monkeypatch):
+    # Лимит задаётся TRANSACTION_CACHE_MAX_MB и читается в CACHE_MAX_BYTES при импорте
+    monkeypatch.setattr(transaction_cache, 'CACHE_MAX_BYTES', int(2.5 * ENTRY_BYTES))
+    cache_dir = tmp_path / 'cache'
+    a, b, c = (write_export(tmp_path, f'Transaction-{name}.xlsx', name.encode()) for name in 'abc')
+    calls = []
+    load(a, cache_dir, calls)
+    load(b, cache_dir, calls)
+
+    # a старше b, но затем снова используется и становится самой свежей записью
+    os.utime(entry_of(cache_dir, a), (1_000_000, 1_000_000))
+    os.utime(entry_of(cache_dir, b), (2_000_000, 2_000_000))
+    load(a, cache_dir, calls)
+    assert calls == [a, b]
+
+    # Третья запись не помещается: вытесняется давно не использованная b
+    load(c, cache_dir, calls)
+    assert len(list(cache_dir.glob(f'*{transaction_cache.ENTRY_SUFFIX}'))) == 2
+    load(a, cache_dir, calls)
+    load(c, cache_dir, calls)
+    assert calls == [a, b, c]
+    load(b, cache_dir, calls)
+    assert calls == [a, b, c, b]
+
+
+parsed = []
+
+
+def fake_partial(file, scale=1):
+    parsed.append(file)
+    with open(file, 'rb') as f:
+        return {'size': len(f.read()) * scale}
+
+
+def test_map_files_incremental_reuses_partials_of_unchanged_exports(tmp_path, monkeypatch):
+    monkeypatch.setattr(transaction_reports, 'CACHE_DIR', tmp_path / 'cache')
+    parsed.clear()
+    a = write_export(tmp_path, 'Transaction-a.xlsx', b'aaa')
+    b = write_export(tmp_path, 'Transaction-b.xlsx', b'bbbbb')
+
+    assert transaction_reports.map_files_incremental(fake_partial, [a, b]) == [{'size': 3}, {'size': 5}]
+    assert parsed == [a, b]
+
+    # Ничего не изменилось; у a только новый mtime — тоже не разбирается заново
+    st = os.stat(a)
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert transaction_reports.map_files_incremental(fake_partial, [a, b]) == [{'size': 3}, {'size': 5}]
+    assert parsed == [a, b]
+
+    # Изменённый файл разбирается заново, другие аргументы — отдельный partial
+    write_export(tmp_path, 'Transaction-b.xlsx', b'bb')
+    assert transaction_reports.map_files_incremental(fake_partial, [a, b]) == [{'size': 3}, {'size': 2}]
+    assert parsed == [a, b, b]
+    assert transaction_reports.map_files_incremental(fake_partial, [a], scale=2) == [{'size': 6}]
+    assert parsed == [a, b, b, a]
+
+    # Удалённая выгрузка забывается в манифесте
+    os.remove(b)
+    transaction_reports.map_files_incremental(fake_partial, [a])
+    with open(tmp_path / 'cache' / transaction_reports.MANIFEST_FILE, encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert list(manifest['files']) == [os.path.abspath(a)]
+    assert parsed == [a, b, b, a]
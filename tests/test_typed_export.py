@@ -0,0 +1,53 @@
+"""
+typed_export.py / transaction_reports.py: суммы округляются до копеек только в итоге
+
+Запуск: python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import transaction_reports
+import typed_export
+
+HEADER = ['Transaction ID', 'Created', 'Merchant Name', 'Last Updated', 'Completion Date',
+          'Type', 'Status', 'Amount', 'Currency']
+
+
+def export_with_amounts(amounts, status='CAPTURED'):
+    rows = [['Transactions'] + [None] * 8, HEADER]
+    for i, amount in enumerate(amounts):
+        rows.append([f'tx{i}', '2026-01-19T09:00:00Z', 'Merchant 000', None, None,
+                     'PAY', status, amount, 'RUB'])
+    return typed_export.typed_export(pd.DataFrame(rows))
+
+
+def test_fractions_of_a_kopeck_are_summed_before_rounding():
+    # По строкам 0.285 → 0.28 и 0.005 → 0.00 дали бы 0.28; без построчного округления — 0.29
+    export = export_with_amounts([0.285, 0.005])
+    stats = transaction_reports.stats_from_export(export)
+    assert transaction_reports.format_amount(stats['amount']) == '0.29'
+
+    report = transaction_reports.status_from_export(export)
+    assert report['CAPTURED']['count'] == 2
+    assert transaction_reports.format_amount(report['CAPTURED']['amount']) == '0.29'
+
+
+def test_streamed_amounts_match_the_typed_sum():
+    amounts = [951863.855, 0.285, '12.5']
+    export = export_with_amounts(amounts)
+    typed = transaction_reports.stats_from_export(export)['amount']
+    streamed = sum(transaction_reports.to_amount(amount) for amount in amounts)
+    assert typed == streamed
+    assert transaction_reports.format_amount(typed) == '951,876.64'
+
+
+def test_format_amount_rounds_half_away_from_zero():
+    scale = typed_export.AMOUNT_SCALE
+    assert transaction_reports.format_amount(1234567 * scale + scale // 200) == '1,234,567.01'
+    assert transaction_reports.format_amount(-(scale // 200)) == '-0.01'
+    assert transaction_reports.format_amount(scale // 200 - 1) == '0.00'
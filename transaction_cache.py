@@ -0,0 +1,284 @@
+"""
+On-disk cache for Transaction-*.xlsx exports.
+
+Every export is parsed with pd.read_excel only once: what the reports need
+from it (the typed form from typed_export.py) is stored in CACHE_DIR and later
+runs of calc_stats.py, angelina_report.py and 12oo.py load it from there
+instead of parsing the workbook again.
+
+An entry is looked up by the export's path, size and mtime; when any of them
+changes, the file's content hash decides whether the stored frame can still
+be used. Entries that are no longer referenced are removed, and the least
+recently used ones are evicted once the cache grows beyond CACHE_MAX_BYTES.
+
+read_header_cached covers the cases where only the top rows of an export are
+needed: it reads them in read-only mode and remembers them per layout.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from lazy_imports import lazy_import
+
+openpyxl = lazy_import('openpyxl')
+pd = lazy_import('pandas')
+
+CACHE_DIR = Path(os.environ.get("TRANSACTION_CACHE_DIR", ".transaction_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("TRANSACTION_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_ENABLED = os.environ.get("TRANSACTION_CACHE", "1") != "0"
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+HEADERS_FILE = "headers.json"
+ENTRY_SUFFIX = ".pkl"
+FORMAT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Returns the sha256 hex digest of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _kwargs_key(key):
+    """Short stable key for the pd.read_excel arguments (or any other load_cached key)."""
+    payload = json.dumps([FORMAT_VERSION, key], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _load_index(cache_dir):
+    try:
+        with open(cache_dir / INDEX_FILE, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == FORMAT_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": FORMAT_VERSION, "sources": {}}
+
+
+def _save_index(cache_dir, index):
+    tmp_path = cache_dir / f"{INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, cache_dir / INDEX_FILE)
+
+
+def _drop_unreferenced(cache_dir, index, entry):
+    """Deletes an entry file once no source points at it any more."""
+    if any(src["entry"] == entry for src in index["sources"].values()):
+        return
+    try:
+        (cache_dir / entry).unlink()
+    except OSError:
+        pass
+
+
+def _evict(cache_dir, index, max_bytes, keep=None):
+    """Forgets deleted exports and removes least recently used entries above max_bytes."""
+    for source_key, src in list(index["sources"].items()):
+        source_path = source_key.rsplit("|", 1)[0]
+        if not os.path.exists(source_path) or not (cache_dir / src["entry"]).exists():
+            del index["sources"][source_key]
+            _drop_unreferenced(cache_dir, index, src["entry"])
+
+    entries = []
+    for entry_path in cache_dir.glob(f"*{ENTRY_SUFFIX}"):
+        try:
+            st = entry_path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, entry_path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if entry_path.name == keep:
+            continue
+        try:
+            entry_path.unlink()
+        except OSError:
+            continue
+        total -= size
+        for source_key, src in list(index["sources"].items()):
+            if src["entry"] == entry_path.name:
+                del index["sources"][source_key]
+
+
+def read_excel_cached(path, cache_dir=None, max_bytes=None, **read_kwargs):
+    """pd.read_excel(path, **read_kwargs) served from the on-disk cache when possible."""
+    return load_cached(path, read_kwargs, lambda: pd.read_excel(path, **read_kwargs), cache_dir, max_bytes)
+
+
+@contextlib.contextmanager
+def _index_lock(cache_dir):
+    """Exclusive lock around a read-modify-write of the index.
+
+    With --workers N several processes update the same index.json; without
+    the lock a worker saving last would drop the entries the others added.
+    """
+    with open(cache_dir / LOCK_FILE, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10 s; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _register(cache_dir, source_key, source, max_bytes=None):
+    """Points source_key at a stored entry in the index (evicting if max_bytes is given)."""
+    with _index_lock(cache_dir):
+        # Re-read under the lock: other workers may have changed it since
+        index = _load_index(cache_dir)
+        old = index["sources"].get(source_key)
+        index["sources"][source_key] = source
+        if old and old["entry"] != source["entry"]:
+            _drop_unreferenced(cache_dir, index, old["entry"])
+        if max_bytes is not None:
+            _evict(cache_dir, index, max_bytes, keep=source["entry"])
+        _save_index(cache_dir, index)
+
+
+def load_cached(path, key, build, cache_dir=None, max_bytes=None):
+    """build() for the export at path, served from the on-disk cache when possible.
+
+    key (anything JSON-serializable) tells apart the different things built
+    from one export, e.g. the pd.read_excel arguments; the result is stored
+    with pd.to_pickle.
+    """
+    if not CACHE_ENABLED:
+        return build()
+
+    cache_dir = Path(cache_dir) if cache_dir is not None else CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return build()
+
+    st = os.stat(path)
+    kw_key = _kwargs_key(key)
+    source_key = f"{os.path.abspath(path)}|{kw_key}"
+    with _index_lock(cache_dir):
+        src = _load_index(cache_dir)["sources"].get(source_key)
+
+    # Hashing and building run outside the lock; only the index update takes it
+    source = None
+    if src and src["size"] == st.st_size and src["mtime_ns"] == st.st_mtime_ns:
+        entry = src["entry"]
+    else:
+        # Size or mtime changed (or the export is new): the content decides
+        entry = f"{file_digest(path)[:32]}-{kw_key}{ENTRY_SUFFIX}"
+        source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "entry": entry}
+
+    entry_path = cache_dir / entry
+    if entry_path.exists():
+        try:
+            result = pd.read_pickle(entry_path)
+            os.utime(entry_path)  # mtime of an entry is its last use
+            # A plain hit leaves the index alone
+            if source is not None:
+                _register(cache_dir, source_key, source)
+            return result
+        except Exception:
+            pass  # damaged entry: parse the export again
+
+    result = build()
+    if source is None:
+        source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "entry": entry}
+    tmp_path = cache_dir / f"{entry}.{os.getpid()}.tmp"
+    try:
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, entry_path)
+        _register(cache_dir, source_key, source, max_bytes)
+    except OSError as e:
+        print(f"⚠️ Cache write failed for {Path(path).name}: {e}")
+    return result
+
+
+def peek_rows(path, rows=2):
+    """First rows of the first sheet, read in read-only mode without loading the rest."""
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()  # exporters do not always write a correct <dimension>
+        return [list(row) for row in ws.iter_rows(max_row=rows, values_only=True)]
+    finally:
+        wb.close()
+
+
+def read_header_cached(path, rows=2, cache_dir=None):
+    """peek_rows(path, rows), remembered per export layout in HEADERS_FILE.
+
+    Exports that were already seen (same path, size and mtime) are answered
+    from the cache without opening the workbook at all.
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else CACHE_DIR
+    if not CACHE_ENABLED:
+        return peek_rows(path, rows)
+
+    headers_path = cache_dir / HEADERS_FILE
+    try:
+        with open(headers_path, encoding="utf-8") as f:
+            headers = json.load(f)
+    except (OSError, ValueError):
+        headers = {}
+    if headers.get("version") != FORMAT_VERSION:
+        headers = {"version": FORMAT_VERSION, "layouts": {}, "files": {}}
+
+    st = os.stat(path)
+    file_key = f"{os.path.abspath(path)}|{rows}"
+    known = headers["files"].get(file_key)
+    if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+        layout = headers["layouts"].get(known["layout"])
+        if layout is not None:
+            return layout
+
+    header_rows = peek_rows(path, rows)
+    layout_json = json.dumps(header_rows, ensure_ascii=False, default=str)
+    layout_key = hashlib.sha256(layout_json.encode("utf-8")).hexdigest()[:16]
+    headers["layouts"][layout_key] = json.loads(layout_json)
+    headers["files"][file_key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "layout": layout_key}
+    # Forget exports that are gone and layouts nobody uses any more
+    headers["files"] = {
+        key: value for key, value in headers["files"].items()
+        if os.path.exists(key.rsplit("|", 1)[0])
+    }
+    used = {value["layout"] for value in headers["files"].values()}
+    headers["layouts"] = {key: value for key, value in headers["layouts"].items() if key in used}
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_dir / f"{HEADERS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(headers, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, headers_path)
+    except OSError:
+        pass
+    return headers["layouts"][layout_key]
@@ -0,0 +1,474 @@
+"""
+Per-file aggregation for the Transaction-*.xlsx reports.
+
+calc_stats.py, angelina_report.py and 12oo.py reduce every export to a small
+partial result here (counts, sums, per-merchant dicts); the scripts merge the
+partials in file order and print them. Partials are plain dicts so they can be
+returned from worker processes when a script runs with --workers N.
+
+Exports are read through typed_export.py, and amounts stay integers
+(millionths of a ruble) from the cell to the printed total, so sums do not
+pick up float error; a total is rounded to kopecks once, in format_amount.
+
+map_files_incremental keeps the partials in a JSON manifest next to the export
+cache, so a re-run only parses exports that are new or have changed.
+"""
+
+import json
+import math
+import os
+import time
+from itertools import repeat
+
+import run_metrics
+from lazy_imports import lazy_import
+from stage_profile import stage
+from transaction_cache import CACHE_DIR, CACHE_ENABLED, file_digest
+from typed_export import (
+    AMOUNT_COL, AMOUNT_FINITE, AMOUNT_FLOAT, AMOUNT_NUMERIC, AMOUNT_PRESENT, AMOUNT_SCALE, STATUS_COL,
+    load_typed_export, moscow_hours, time_seconds,
+)
+
+np = lazy_import('numpy')
+openpyxl = lazy_import('openpyxl')
+pd = lazy_import('pandas')
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 6  # bump when a partial changes shape or meaning
+
+REPORT_STATUSES = ['CAPTURED', 'CANCELLED', 'DECLINED', 'REFUNDED', 'ERROR', 'PAID_OUT']
+
+# Строки, которые pd.read_excel считает пустыми значениями (NaN)
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+}
+
+
+def _timed_call(func, file, kwargs):
+    started = time.perf_counter()
+    result = func(file, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def map_files(func, files, workers=1, **kwargs):
+    """Applies func(file, **kwargs) to every file, in a process pool when workers > 1.
+
+    Results always come back in the order of files, so merging them gives the
+    same output as a sequential run. Each call is timed where it runs and the
+    time is passed on to run_metrics.
+    """
+    if workers <= 1 or len(files) <= 1:
+        timed = [_timed_call(func, file, kwargs) for file in files]
+    else:
+        # Пул нужен только с --workers, его модуль не грузится заранее
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            timed = list(pool.map(_timed_call, repeat(func), files, repeat(kwargs)))
+    for file, (_, seconds) in zip(files, timed):
+        run_metrics.file_parsed(file, seconds)
+    return [result for result, _ in timed]
+
+
+def _load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def map_files_incremental(func, files, workers=1, **kwargs):
+    """map_files with per-file partials persisted in the manifest.
+
+    Every export is stored with its size, mtime, content hash and the partials
+    computed for it. A re-run reuses them for unchanged exports (a changed
+    mtime with the same content still counts as unchanged), parses only new or
+    changed files and forgets exports that were deleted.
+    """
+    if not CACHE_ENABLED:
+        return map_files(func, files, workers, **kwargs)
+
+    manifest_path = CACHE_DIR / MANIFEST_FILE
+    manifest = _load_manifest(manifest_path)
+    report_key = f"{func.__name__}:{json.dumps(kwargs, sort_keys=True, default=str)}"
+
+    results = [None] * len(files)
+    todo = []
+    for i, file in enumerate(files):
+        path = os.path.abspath(file)
+        st = os.stat(file)
+        entry = manifest["files"].get(path)
+        if entry and (entry["size"], entry["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+            digest = file_digest(file)
+            if digest == entry["digest"]:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            else:
+                entry = None
+        if entry is None:
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": None, "partials": {}}
+            manifest["files"][path] = entry
+        if report_key in entry["partials"]:
+            results[i] = entry["partials"][report_key]
+            run_metrics.file_parsed(file, 0.0, cached=True)
+        else:
+            todo.append(i)
+
+    for i, part in zip(todo, map_files(func, [files[i] for i in todo], workers, **kwargs)):
+        results[i] = part
+        if 'error' in part:
+            continue  # failed files are retried on the next run
+        entry = manifest["files"][os.path.abspath(files[i])]
+        if entry["digest"] is None:
+            entry["digest"] = file_digest(files[i])
+        entry["partials"][report_key] = part
+
+    manifest["files"] = {
+        path: entry for path, entry in manifest["files"].items()
+        if entry["digest"] is not None and os.path.exists(path)
+    }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_DIR / f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        print(f"⚠️ Manifest write failed: {e}")
+    return results
+
+
+def format_amount(amount):
+    """An amount (millionths of a ruble) as rubles, 1,234,567.89.
+
+    The total is rounded to kopecks only here, half away from zero, without
+    going through float.
+    """
+    sign = '-' if amount < 0 else ''
+    kopecks, rest = divmod(abs(int(amount)), AMOUNT_SCALE // 100)
+    if 2 * rest >= AMOUNT_SCALE // 100:
+        kopecks += 1
+    rubles, kop = divmod(kopecks, 100)
+    return f"{sign}{rubles:,}.{kop:02d}"
+
+
+# === calc_stats.py: success rate and turnover ===
+
+def is_empty_cell(value):
+    """Пустая ячейка с точки зрения pd.read_excel"""
+    return value is None or (isinstance(value, str) and value in NA_STRINGS)
+
+
+def to_amount(value):
+    """Сумма в миллионных долях рубля или None — так же, как pd.to_numeric(errors='coerce').
+
+    inf считается числом, но в оборот не идёт (0).
+    """
+    if isinstance(value, bool):
+        result = float(value)
+    elif isinstance(value, (int, float)):
+        result = float(value)
+    elif isinstance(value, str) and '_' not in value and value not in NA_STRINGS:
+        try:
+            result = float(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    if math.isnan(result):
+        return None
+    return round(result * AMOUNT_SCALE) if math.isfinite(result) else 0
+
+
+def stream_file_totals(file):
+    """Потоково читает выгрузку и возвращает (всего строк, успешных, сумма успешных).
+
+    Файл читается openpyxl в режиме read_only построчно, из каждой строки
+    берутся только статус и сумма, поэтому память не зависит от размера файла.
+    """
+    total_operations = 0
+    successful_operations = 0
+    total_amount = 0
+
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        # Первая строка — заголовок выгрузки, пропускаем её
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            if all(is_empty_cell(value) for value in row):
+                continue
+            total_operations += 1
+            if len(row) <= AMOUNT_COL or row[STATUS_COL] != 'CAPTURED':
+                continue
+            amount = to_amount(row[AMOUNT_COL])
+            if amount is not None:
+                successful_operations += 1
+                total_amount += amount
+    finally:
+        wb.close()
+
+    return total_operations, successful_operations, total_amount
+
+
+def stats_from_export(export):
+    """Всего строк, успешных (CAPTURED с числовой суммой) и их сумма для одной выгрузки."""
+    # Первая строка выгрузки не считается; если это заголовок «Transactions»,
+    # то строка с названиями колонок после него — считается, как и раньше
+    header_counted = export['has_title'] and not all(pd.isna(cell) for cell in export['header'])
+    data = export['data']
+    rows = len(data) - export['blank_rows'] + int(header_counted)
+    if export['columns'] <= AMOUNT_COL:
+        return {'rows': rows, 'successful': 0, 'amount': 0}
+
+    flags = data['flags'].to_numpy()
+    valid = (data['status'] == 'CAPTURED').to_numpy() & (flags & AMOUNT_NUMERIC > 0)
+    # inf counts as a successful operation but cannot go into the turnover
+    summed = valid & (flags & AMOUNT_FINITE > 0)
+    return {
+        'rows': rows,
+        'successful': int(valid.sum()),
+        'amount': int(data['amount'].to_numpy()[summed].sum()),
+    }
+
+
+def stats_partial(file, stream=False):
+    try:
+        if stream:
+            with stage('stream_read') as st:
+                rows, successful, amount = stream_file_totals(file)
+                st.rows = rows
+            return {'rows': rows, 'successful': successful, 'amount': amount}
+        export = load_typed_export(file)
+        with stage('stats') as st:
+            st.rows = len(export['data'])
+            return stats_from_export(export)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def merge_stats(partials):
+    total = {'rows': 0, 'successful': 0, 'amount': 0}
+    for part in partials:
+        if 'error' in part:
+            continue
+        for key in total:
+            total[key] += part[key]
+    return total
+
+
+# === angelina_report.py: count and amount per status ===
+
+def empty_status_report():
+    return {status: {'count': 0, 'amount': 0} for status in REPORT_STATUSES}
+
+
+def status_from_export(export):
+    """Count and amount per status, or None when the export has fewer than 8 columns.
+
+    Statuses are categoricals, so strip/upper runs once per distinct value;
+    counts come from one np.bincount over the status codes.
+    """
+    # Expect at least 8 columns (status index 6, amount index 7)
+    if export['columns'] < 8:
+        return None
+
+    data = export['data']
+    statuses = data['status'].cat
+
+    # Missing statuses have code -1 and are never counted
+    status_index = {status: i for i, status in enumerate(REPORT_STATUSES)}
+    unique_to_report = np.array(
+        [status_index.get(str(u).strip().upper(), -1) for u in statuses.categories] + [-1], dtype=np.intp
+    )
+    report_codes = unique_to_report[statuses.codes.to_numpy()]
+
+    # Non-empty amounts count towards the status, the ones float() reads are summed
+    flags = data['flags'].to_numpy()
+    counted = (report_codes >= 0) & (flags & AMOUNT_PRESENT > 0)
+    summed = counted & (flags & AMOUNT_FLOAT > 0) & (flags & AMOUNT_FINITE > 0)
+    counts = np.bincount(report_codes[counted], minlength=len(REPORT_STATUSES))
+    # Integer sums per status: float64 bincount weights would lose exactness
+    amounts = data['amount'].to_numpy()
+    sums = [int(amounts[summed & (report_codes == i)].sum()) for i in range(len(REPORT_STATUSES))]
+
+    return {
+        status: {'count': int(counts[i]), 'amount': sums[i]}
+        for i, status in enumerate(REPORT_STATUSES)
+    }
+
+
+def status_partial(file):
+    try:
+        export = load_typed_export(file)
+        with stage('status') as st:
+            st.rows = len(export['data'])
+            report = status_from_export(export)
+    except Exception as e:
+        return {'error': str(e)}
+    if report is None:
+        return {'skipped': True}
+    return {'report': report, 'rows': export['raw_rows']}
+
+
+def merge_status(partials):
+    total = empty_status_report()
+    for part in partials:
+        for status, values in part.get('report', {}).items():
+            total[status]['count'] += values['count']
+            total[status]['amount'] += values['amount']
+    return total
+
+
+# === 12oo.py: transactions per merchant and hour of day (Moscow time) ===
+
+HOURS = 24
+
+
+def clean_merchant_codes(codes, names):
+    """Merchant codes after cleaning the names; -1 for missing or empty ones.
+
+    Names are cleaned once per distinct raw value and may collapse (" A " and "A").
+    """
+    clean_index = {}
+    mapping = np.full(len(names) + 1, -1, dtype=np.intp)  # last slot: missing cells (-1)
+    for code, raw in enumerate(names):
+        merchant = str(raw).strip()
+        if merchant and merchant.lower() not in ['nan', '']:
+            mapping[code] = clean_index.setdefault(merchant, len(clean_index))
+    return mapping[codes], list(clean_index)
+
+
+def hourly_from_export(export, time_col):
+    """Transactions per hour of day (Moscow time), overall and per merchant, for one export.
+
+    The merchant × hour count matrix comes from one np.bincount over
+    merchant * 24 + hour. Next to it is the first row of every cell, so any
+    window of hours lists merchants in order of first appearance, as the
+    old per-row loop did.
+    """
+    if export['raw_rows'] == 0:
+        return {'empty': True}
+
+    # Check for data
+    data = export['data']
+    if len(data) == 0:
+        return {'skipped': 'insufficient data'}
+
+    count_total = len(data)
+    seconds = time_seconds(export, time_col)
+    if seconds is not None:
+        hours = moscow_hours(seconds)
+    else:
+        hours = np.full(count_total, -1, dtype='int64')
+    timed = hours >= 0
+
+    merchant_hours = np.zeros((0, HOURS), dtype='int64')
+    merchant_first = np.zeros((0, HOURS), dtype='int64')
+    names = []
+    if 'merchant' in data:
+        merchants = data['merchant'].cat
+        codes, names = clean_merchant_codes(merchants.codes.to_numpy(), merchants.categories)
+        rows = np.flatnonzero(timed & (codes >= 0))
+        cells = codes[rows] * HOURS + hours[rows]
+        merchant_hours = np.bincount(cells, minlength=len(names) * HOURS).reshape(-1, HOURS)
+        first_cells, first_pos = np.unique(cells, return_index=True)
+        merchant_first = np.full(len(names) * HOURS, -1, dtype='int64')
+        merchant_first[first_cells] = rows[first_pos]
+        merchant_first = merchant_first.reshape(-1, HOURS)
+
+    return {
+        'columns': export['columns'],
+        'rows': count_total + 1,  # with the header row, as the export shows it
+        'merchant_col': export['merchant_col'],
+        'total': count_total,
+        'invalid': int((~timed).sum()),
+        'hour_totals': np.bincount(hours[timed], minlength=HOURS).tolist(),
+        'merchants': names,
+        'merchant_hours': merchant_hours.tolist(),
+        'merchant_first': merchant_first.tolist(),
+    }
+
+
+def hour_window(start, end):
+    """Mask of the hours in [start, end), wrapping past midnight when start > end."""
+    hours = np.arange(HOURS)
+    if start <= end:
+        return (hours >= start) & (hours < end)
+    return (hours >= start) | (hours < end)
+
+
+def window_counts(part, window):
+    """(transactions in the window, {merchant: count} in order of first appearance) from an hourly partial."""
+    mask = hour_window(*window)
+    in_window = int(np.asarray(part['hour_totals'])[mask].sum())
+
+    counts = np.asarray(part['merchant_hours'], dtype='int64').reshape(-1, HOURS)[:, mask].sum(axis=1)
+    first = np.asarray(part['merchant_first'], dtype='int64').reshape(-1, HOURS)[:, mask]
+    first = np.where(first >= 0, first, np.iinfo('int64').max).min(axis=1)
+    merchants_in_window = {
+        part['merchants'][i]: int(counts[i]) for i in np.argsort(first, kind='stable') if counts[i] > 0
+    }
+    return in_window, merchants_in_window
+
+
+def load_noon_export(file, time_col, export=None):
+    """Typed export that has time_col as a time column.
+
+    The typed form converts the columns the header calls times; a report by
+    some other column reads the export with that column converted as well.
+    """
+    if export is None:
+        export = load_typed_export(file)
+    if 0 <= time_col < export['columns'] and time_seconds(export, time_col) is None:
+        export = load_typed_export(file, time_cols=[time_col])
+    return export
+
+
+def hourly_partial(file, time_col):
+    try:
+        export = load_noon_export(file, time_col)
+        with stage('noon') as st:
+            st.rows = len(export['data'])
+            return hourly_from_export(export, time_col)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+# === Fused engine: all three reports from one read ===
+
+REPORTS = ('stats', 'status', 'noon')
+
+
+def _report_partial(report, file, export, time_col):
+    try:
+        if report == 'noon':
+            export = load_noon_export(file, time_col, export)
+        with stage(report) as st:
+            st.rows = len(export['data'])
+            if report == 'stats':
+                return stats_from_export(export)
+            if report == 'status':
+                result = status_from_export(export)
+                return {'skipped': True} if result is None else {'report': result, 'rows': export['raw_rows']}
+            return hourly_from_export(export, time_col)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def fused_partial(file, reports=REPORTS, time_col=2):
+    """Loads an export once and computes the selected reports from the same typed form.
+
+    Returns {report: partial}, each partial shaped like the one the standalone
+    script gets from stats_partial, status_partial or hourly_partial.
+    """
+    try:
+        export = load_typed_export(file)
+    except Exception as e:
+        return {report: {'error': str(e)} for report in reports}
+    return {report: _report_partial(report, file, export, time_col) for report in reports}
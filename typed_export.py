@@ -0,0 +1,234 @@
+"""
+Compact typed form of a Transaction-*.xlsx export.
+
+pd.read_excel gives an object frame: every cell is a separate Python object,
+several hundred bytes per row of an export. calc_stats.py, angelina_report.py
+and 12oo.py only look at the status, amount, merchant and time columns, so
+right after reading an export is reduced to those, typed:
+
+  status    categorical of the raw status cells
+  merchant  categorical of the raw merchant cells (column found by the header)
+  amount    the amount as int64 millionths of a ruble (AMOUNT_SCALE), so
+            turnover sums are exact; a total is rounded to kopecks once,
+            when it is printed
+  flags     what the amount cell held: AMOUNT_PRESENT (not empty),
+            AMOUNT_NUMERIC (pd.to_numeric reads it, calc_stats.py's rule),
+            AMOUNT_FLOAT (float() reads it, angelina_report.py's rule) and
+            AMOUNT_FINITE (amount holds it; 'inf' still counts as a number,
+            but stays out of the sums)
+  t<N>      int64 UTC epoch seconds of time column N, NO_TIME where the cell
+            is empty or not a time; every header column that looks like a
+            time gets one
+
+load_typed_export stores the typed form in the export cache, so a cached
+export is also several times smaller on disk.
+"""
+
+import warnings
+
+from lazy_imports import lazy_import
+from stage_profile import stage
+from transaction_cache import load_cached
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+TYPED_VERSION = 3  # bump when the typed form changes
+
+# === Export layout ===
+STATUS_COL = 6  # Колонка 6 — это статус (начинаем с 0)
+AMOUNT_COL = 7  # Колонка 7 — сумма в RUB
+
+TIME_KEYWORDS = ['created', 'date', 'time', 'timestamp', 'updated', 'completion']
+
+# Bits of the flags column
+AMOUNT_PRESENT = 1
+AMOUNT_NUMERIC = 2
+AMOUNT_FLOAT = 4
+AMOUNT_FINITE = 8
+
+# amount holds rubles × AMOUNT_SCALE: fine enough for amounts with fractions
+# of a kopeck (0.285), still far from int64 overflow for daily totals
+AMOUNT_SCALE = 10 ** 6
+
+NO_TIME = -2 ** 63  # int64 minimum: empty or unparseable time cell
+
+# === Moscow Timezone Setup ===
+MOSCOW_UTC_OFFSET_HOURS = 3
+
+
+def strip_title_row(df):
+    """Skips the "Transactions" row at the top of an export if present."""
+    first_cell = str(df.iloc[0, 0]).strip()
+    if first_cell.lower() == "transactions":
+        df = df.iloc[1:].reset_index(drop=True)
+    return df
+
+
+def get_merchant_column_index(df):
+    """Searches for the merchant name column index in the header (first row)."""
+    try:
+        first_row = df.iloc[0]
+        for idx, cell in enumerate(first_row):
+            cell_str = str(cell).strip().lower()
+            if 'merchant' in cell_str or 'name' in cell_str:
+                return idx
+    except Exception:
+        pass
+    return -1
+
+
+def time_column_indexes(header):
+    """Indexes of the header cells that name a time column."""
+    return [idx for idx, cell in enumerate(header)
+            if any(keyword in str(cell).strip().lower() for keyword in TIME_KEYWORDS)]
+
+
+def parse_utc_times(ts_strs):
+    """Parses stripped timestamp strings into UTC, NaT where they cannot be parsed.
+
+    ISO 8601 strings (the export format) go through one vectorized call;
+    naive values are taken as UTC. Whatever is left falls back to the same
+    free-form parser pd.to_datetime uses for single strings. Both formats
+    need pandas 2.0 (requirements.txt).
+    """
+    parsed = pd.to_datetime(ts_strs, utc=True, errors='coerce', format='ISO8601')
+    leftover = parsed.isna()
+    if leftover.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            parsed[leftover] = pd.to_datetime(ts_strs[leftover], utc=True, errors='coerce', format='mixed')
+    return parsed
+
+
+def epoch_seconds_for_cells(cells):
+    """UTC epoch seconds for every raw time cell, NO_TIME where the time cannot be used."""
+    # Timestamps repeat a lot within a day, so each distinct value is parsed
+    # once and the result is spread back over the rows by code
+    codes, uniques = pd.factorize(pd.Series(cells, dtype=object))
+    ts_strs = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    has_value = (ts_strs != '') & (ts_strs.str.lower() != 'nan')
+    with stage('parse_times') as st:
+        st.rows = int(has_value.sum())
+        utc_times = parse_utc_times(ts_strs[has_value])
+    parsed = utc_times.notna()
+
+    # The extra last slot is what missing cells (code -1) pick up
+    seconds = np.full(len(uniques) + 1, NO_TIME, dtype='int64')
+    seconds[np.flatnonzero(has_value)[parsed.to_numpy()]] = (
+        utc_times[parsed].dt.tz_convert(None).to_numpy().astype('datetime64[s]').astype('int64')
+    )
+    return seconds[codes]
+
+
+def moscow_hours(seconds):
+    """Hour of day in Moscow time for epoch seconds, -1 for NO_TIME (Moscow has no DST, so a fixed shift)."""
+    hours = (seconds // 3600 + MOSCOW_UTC_OFFSET_HOURS) % 24
+    hours[seconds == NO_TIME] = -1
+    return hours
+
+
+def float_amounts(cells):
+    """float(cell) for every amount cell, NaN where float() fails."""
+    try:
+        # Usually every cell is a number or a numeric string: one C-level cast
+        return cells.astype('float64')
+    except (ValueError, TypeError):
+        pass
+    values = pd.to_numeric(pd.Series(cells), errors='coerce').to_numpy(dtype='float64', copy=True)
+    # Cells pd.to_numeric could not settle go through float() one by one
+    for pos in np.flatnonzero(np.isnan(values)):
+        try:
+            values[pos] = float(cells[pos])
+        except (ValueError, TypeError):
+            pass
+    return values
+
+
+def to_amount_units(values):
+    """Rubles as float64 → (int64 millionths of a ruble, mask of finite values)."""
+    finite = np.isfinite(values)
+    units = np.zeros(len(values), dtype='int64')
+    units[finite] = np.rint(values[finite] * AMOUNT_SCALE)
+    return units, finite
+
+
+def amount_columns(cells):
+    """amount and flags columns for the raw amount cells."""
+    cells = np.asarray(cells, dtype=object)
+    numeric_values = pd.to_numeric(pd.Series(cells), errors='coerce').to_numpy(dtype='float64', copy=True)
+    float_values = float_amounts(cells)
+    numeric, numeric_finite = to_amount_units(numeric_values)
+    exact, float_finite = to_amount_units(float_values)
+
+    flags = np.where(pd.isna(cells), 0, AMOUNT_PRESENT).astype('uint8')
+    flags |= np.where(~np.isnan(numeric_values), AMOUNT_NUMERIC, 0).astype('uint8')
+    flags |= np.where(~np.isnan(float_values), AMOUNT_FLOAT, 0).astype('uint8')
+    flags |= np.where(numeric_finite | float_finite, AMOUNT_FINITE, 0).astype('uint8')
+    return np.where(float_finite, exact, numeric), flags
+
+
+def categorical(cells):
+    """Raw cells as a categorical, categories in order of first appearance."""
+    codes, uniques = pd.factorize(pd.Series(cells, dtype=object))
+    return pd.Categorical.from_codes(codes, categories=uniques)
+
+
+def typed_export(raw, time_cols=()):
+    """Typed form of an export read with pd.read_excel(path, header=None).
+
+    time_cols are converted to epoch seconds in addition to the header's own
+    time columns (for a report counting by a column the header does not name).
+    """
+    has_title = not raw.empty and str(raw.iloc[0, 0]).strip().lower() == "transactions"
+    start = 1 + has_title  # first data row: after the title and the header
+    header_rows = raw.iloc[int(has_title):start]
+    header = list(header_rows.iloc[0]) if len(header_rows) else []
+    rows = raw.iloc[start:]
+
+    data = pd.DataFrame(index=pd.RangeIndex(len(rows)))
+    if raw.shape[1] > STATUS_COL:
+        data['status'] = categorical(rows.iloc[:, STATUS_COL])
+    if raw.shape[1] > AMOUNT_COL:
+        data['amount'], data['flags'] = amount_columns(rows.iloc[:, AMOUNT_COL])
+    merchant_col = get_merchant_column_index(header_rows)
+    if merchant_col >= 0:
+        data['merchant'] = categorical(rows.iloc[:, merchant_col])
+    for idx in sorted(set(time_column_indexes(header)) | set(time_cols)):
+        if 0 <= idx < raw.shape[1]:
+            data[f't{idx}'] = epoch_seconds_for_cells(rows.iloc[:, idx])
+
+    return {
+        'version': TYPED_VERSION,
+        'raw_rows': len(raw),
+        'columns': raw.shape[1],
+        'has_title': has_title,
+        'header': header,
+        'merchant_col': merchant_col,
+        'blank_rows': int(rows.isna().all(axis=1).sum()),
+        'data': data,
+    }
+
+
+def load_typed_export(path, time_cols=()):
+    """The typed form of the export at path, served from the export cache when possible."""
+    time_cols = sorted(set(time_cols))
+
+    def build():
+        raw = pd.read_excel(path, header=None)
+        with stage('typed') as st:
+            st.rows = len(raw)
+            return typed_export(raw, time_cols)
+
+    with stage('read_excel') as st:
+        export = load_cached(path, {'typed': TYPED_VERSION, 'time_cols': time_cols}, build)
+        st.rows = export['raw_rows']
+    return export
+
+
+def time_seconds(export, time_col):
+    """Epoch seconds of time_col, or None when the typed form does not have it."""
+    column = f't{time_col}'
+    if column in export['data']:
+        return export['data'][column].to_numpy()
+    return None
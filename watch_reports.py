@@ -0,0 +1,284 @@
+"""
+Наблюдение за папкой с выгрузками
+
+Скрипт запускается один раз и остаётся работать: pandas и openpyxl уже
+загружены, а при появлении или изменении выгрузки пересчитывается только она.
+Отслеживаются:
+  Transaction-*.xlsx        — отчёты calc_stats.py, angelina_report.py и 12oo.py
+  OREC*.csv                 — итог как в calc_new.py
+  *aggregated_data*.csv     — нормализация как в rep0000.py (сводка по мерчантам)
+
+На Linux изменения приходят через inotify, в остальных случаях папка
+опрашивается раз в несколько секунд. Свежие цифры печатаются после каждого
+изменения и, с --output, сохраняются в файл.
+
+=== КАК ЗАПУСТИТЬ ===
+
+1. В папке с выгрузками:
+   python watch_reports.py
+
+2. С колонкой времени для 12oo и файлом с последними цифрами:
+   python watch_reports.py --time_column 1 --output watch_report.txt
+
+3. Опрос папки вместо inotify (например, сетевая папка):
+   python watch_reports.py --poll 5
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import fnmatch
+import glob
+import io
+import os
+import select
+import struct
+import sys
+import time
+from datetime import datetime
+
+from transaction_reports import REPORTS, fused_partial, map_files_incremental
+
+import calc_new
+import morning_report
+import rep0000
+
+WATCH_PATTERNS = {
+    'transactions': 'Transaction-*.xlsx',
+    'orec': 'OREC*.csv',
+    'aggregated': '*aggregated_data*.csv',
+}
+
+# События inotify (linux/inotify.h): файл дописан и закрыт, переименован или удалён
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len; за ним имя файла
+
+# Как часто проверять, не затихли ли изменения (секунды)
+TICK_SECONDS = 0.5
+
+
+def file_kind(name):
+    """Какой тип выгрузки у файла (ключ WATCH_PATTERNS) или None"""
+    for kind, pattern in WATCH_PATTERNS.items():
+        if fnmatch.fnmatch(name, pattern):
+            return kind
+    return None
+
+
+def inotify_changes(folder, tick=TICK_SECONDS):
+    """Имена файлов folder, изменившихся с прошлого шага, по событиям inotify.
+
+    Каждые tick секунд без событий отдаётся пустое множество.
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    if libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK) < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, "inotify_add_watch failed")
+
+    try:
+        while True:
+            names = set()
+            ready, _, _ = select.select([fd], [], [], tick)
+            if ready:
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b''
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = data[offset:offset + length].rstrip(b'\0')
+                    offset += length
+                    if name:
+                        names.add(os.fsdecode(name))
+            yield names
+    finally:
+        os.close(fd)
+
+
+def scan_folder(folder):
+    """Размер и mtime всех отслеживаемых файлов folder"""
+    snapshot = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if file_kind(entry.name) is None:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+    return snapshot
+
+
+def polling_changes(folder, interval):
+    """Имена файлов folder, изменившихся с прошлого опроса (раз в interval секунд)"""
+    snapshot = scan_folder(folder)
+    while True:
+        time.sleep(interval)
+        current = scan_folder(folder)
+        yield {name for name in current.keys() | snapshot.keys() if current.get(name) != snapshot.get(name)}
+        snapshot = current
+
+
+def watch_changes(folder, poll=None):
+    """inotify, если доступен и не просили опрос; иначе опрос папки"""
+    if poll is None and sys.platform.startswith('linux'):
+        try:
+            changes = inotify_changes(folder)
+            next(changes)  # сразу проверяем, что inotify работает
+            print(f"👀 Watching {folder} (inotify)")
+            return changes
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify unavailable ({e}), falling back to polling")
+    interval = poll or 2.0
+    print(f"👀 Watching {folder} (polling every {interval:g} s)")
+    return polling_changes(folder, interval)
+
+
+def settled_batches(changes, settle):
+    """Собирает изменения в пачки: пачка отдаётся, когда settle секунд ничего не менялось.
+
+    Так файл, который ещё копируется, обрабатывается один раз, уже целиком.
+    """
+    pending = set()
+    last_change = 0.0
+    for names in changes:
+        names = {name for name in names if file_kind(name) is not None}
+        if names:
+            pending |= names
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= settle:
+            yield sorted(pending)
+            pending = set()
+
+
+def transaction_section(args):
+    files = sorted(glob.glob(WATCH_PATTERNS['transactions']))
+    if not files:
+        print(f"❌ No files matching '{WATCH_PATTERNS['transactions']}' yet.")
+        return
+    noon_files = [f for f in files if fnmatch.fnmatch(f, morning_report.NOON_PATTERN)]
+    # Не изменившиеся файлы берутся из манифеста, разбираются только новые
+    partials = map_files_incremental(fused_partial, files, args.workers, reports=REPORTS, time_col=args.time_column)
+    morning_report.print_reports(files, partials, REPORTS, noon_files, args.time_column)
+
+
+def orec_section(state, changed):
+    for name in changed:
+        if file_kind(name) == 'orec':
+            state.pop(name, None)
+    for name in sorted(glob.glob(WATCH_PATTERNS['orec'])):
+        if name not in state:
+            try:
+                state[name] = calc_new.orec_stats(name)
+            except Exception as e:
+                print(f"❌ Error processing {name}: {e}")
+                continue
+        print("\n" + "#"*60 + f"\n# {name} (calc_new.py)\n" + "#"*60)
+        calc_new.print_orec_stats(state[name])
+
+
+def aggregated_section(state, changed, caches):
+    for name in changed:
+        if file_kind(name) == 'aggregated':
+            state.pop(name, None)
+    names = sorted(glob.glob(WATCH_PATTERNS['aggregated']))
+    if names:
+        print("\n" + "#"*60 + "\n# aggregated_data (rep0000.py)\n" + "#"*60)
+    for name in names:
+        if name not in state:
+            # Подробный вывод нормализации не нужен — только итог по файлу
+            result = rep0000.load_and_normalize(name, os.getcwd(), caches['dialects'], caches['schemas'], [],
+                                                capture_output=True)
+            if result['dialect'] is not None:
+                caches['dialects'][result['file_type']] = result['dialect']
+            caches['schemas'].update(result['schemas'])
+            state[name] = result
+        df = state[name]['df']
+        if df is None:
+            print(f"❌ {name}: error, see rep0000.py output for details")
+        else:
+            print(f"{name}: {df['merchant_name'].nunique()} merchants, "
+                  f"date1 {int(df['date1'].sum())} → date2 {int(df['date2'].sum())}")
+
+
+def build_report(args, changed, state):
+    """Текст всех отчётов по текущему содержимому папки"""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        print(f"🕐 {datetime.now():%Y-%m-%d %H:%M:%S}" + (f" — changed: {', '.join(changed)}" if changed else ""))
+        transaction_section(args)
+        orec_section(state['orec'], changed)
+        aggregated_section(state['aggregated'], changed, state['caches'])
+    return out.getvalue()
+
+
+def publish(report, output):
+    print(report, end='', flush=True)
+    if output:
+        tmp_path = f"{output}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        os.replace(tmp_path, output)
+
+
+def save_caches(folder, caches):
+    rep0000.save_folder_cache(folder, rep0000.DIALECT_CACHE_FILE, caches['dialects'])
+    rep0000.save_folder_cache(folder, rep0000.SCHEMA_CACHE_FILE, caches['schemas'])
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Пересчёт отчётов по мере появления выгрузок в текущей папке')
+    parser.add_argument('--time_column', type=int, default=2,
+                        help='Индекс колонки времени для отчёта 12oo (по умолчанию 2)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Сколько файлов разбирать параллельно (по умолчанию 1)')
+    parser.add_argument('--poll', type=float,
+                        help='Опрашивать папку раз в N секунд вместо inotify')
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='Сколько секунд без изменений ждать перед пересчётом (по умолчанию 1)')
+    parser.add_argument('--output',
+                        help='Файл, в который сохраняются последние отчёты')
+    parser.add_argument('--once', action='store_true',
+                        help='Посчитать текущее состояние папки и выйти')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    folder = os.getcwd()
+    state = {
+        'orec': {},
+        'aggregated': {},
+        'caches': {
+            'dialects': rep0000.load_folder_cache(folder, rep0000.DIALECT_CACHE_FILE),
+            'schemas': rep0000.load_folder_cache(folder, rep0000.SCHEMA_CACHE_FILE),
+        },
+    }
+
+    publish(build_report(args, [], state), args.output)
+    save_caches(folder, state['caches'])
+    if args.once:
+        return
+
+    try:
+        for changed in settled_batches(watch_changes(folder, args.poll), args.settle):
+            publish("\n" + build_report(args, changed, state), args.output)
+            save_caches(folder, state['caches'])
+    except KeyboardInterrupt:
+        print("\n👋 Stopped.")
+
+
+if __name__ == "__main__":
+    main()